@@ -2,20 +2,9 @@ import streamlit as st
 import polars as pl
 from datetime import timedelta
 from middleware import authenticate_user
-import toml
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-import io
-
-config = toml.load("./.streamlit/secrets.toml")
-key = config["secrets"]["data_key"].encode("utf-8")
-
-
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
+from aggregates import load_daily_aggregates
+from data_store import latest_date
+from lookups import price_shops
 
 # Page configuration
 st.set_page_config(
@@ -59,48 +48,30 @@ if authenticate_user():
         "##### This dashboard is created to monitor the prices on Idealo. The data is scraped from the website and updated every 24 hours."
     )
 
-    with open("./data/Ien.parquet", "rb") as f:
-        encrypted_data = f.read()
-        buffer = io.BytesIO(decrypt_data(encrypted_data, key))
-        df = pl.read_parquet(buffer)
-
-    df_de = df.filter(pl.col("country") == "de").with_columns(
-        pl.col("date").cast(pl.Date)
-    )
-    df_de_ld = df_de.filter(
-        pl.col("date") >= (pl.col("date").max() - timedelta(days=10))
+    last_day = latest_date("de")
+    # Top-3 shops per article and day come precomputed from the daily aggregates
+    df_de_ld = load_daily_aggregates(
+        "de", date_range=(last_day - timedelta(days=10), None)
     )
 
-    df_de_ld_grouped = (
-        (
-            df_de_ld.drop("country", "price_delivery")
-            .sort("price")
-            .group_by("date", "article")
-            .agg(pl.col("shop").head(3))
-            .explode("shop")
-        )["shop"]
-        .value_counts()
-        .sort("count", descending=True)
-        .head(5)
-    )
+    def top_shops(column):
+        return (
+            df_de_ld.select(pl.col(f"top3_{column}").explode().alias("shop"))["shop"]
+            .drop_nulls()
+            .value_counts()
+            .sort("count", descending=True)
+            .head(5)
+        )
+
+    df_de_ld_grouped = top_shops("price")
     top_de_shops = ", ".join(df_de_ld_grouped["shop"].to_list())
 
-    df_de_ld_grouped2 = (
-        (
-            df_de_ld.drop("country", "price")
-            .sort("price_delivery")
-            .group_by("date", "article")
-            .agg(pl.col("shop").head(3))
-            .explode("shop")
-        )["shop"]
-        .value_counts()
-        .sort("count", descending=True)
-        .head(5)
-    )
-    top_de_shops2 = ", ".join(df_de_ld_grouped["shop"].to_list())
+    df_de_ld_grouped2 = top_shops("price_delivery")
+    top_de_shops2 = ", ".join(df_de_ld_grouped2["shop"].to_list())
 
-    last_date_de = df["date"].max().strftime("%d.%m.%Y")
-    shops_de = df_de["shop"].unique()
+    last_date_de = last_day.strftime("%d.%m.%Y")
+    # The shop list is a cached lookup; the history itself is never loaded here
+    shops_de = pl.Series("shop", price_shops("de"))
     shops_de_num = shops_de.len()
 
     def custom_metric(label, value):
@@ -131,4 +102,4 @@ if authenticate_user():
         )
     st.divider()
 
-    st.dataframe(shops_de.sort().to_frame(), hide_index=True)
+    st.dataframe(shops_de.to_frame(), hide_index=True)
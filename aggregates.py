@@ -0,0 +1,86 @@
+"""Per-day price aggregates by (country, article, date).
+
+The table is materialised at ingest (`python ingest.py aggregates`) so that
+chart reference lines and the intro metrics are lookups instead of
+full-history group-bys.
+"""
+import os
+from datetime import timedelta
+
+import polars as pl
+
+from data_store import (
+    AGGREGATES_PATH,
+    PRICES_PATH,
+    load_data,
+    load_versioned,
+    partition_months,
+    scan_prices_versioned,
+)
+
+PRICE_COLUMNS = ("price", "price_delivery")
+
+
+def _price_aggs(column):
+    by_price = pl.col("shop").sort_by(column, nulls_last=True)
+    return [
+        pl.col(column).min().alias(f"min_{column}"),
+        by_price.first().alias(f"min_{column}_shop"),
+        pl.col(column).mean().alias(f"mean_{column}"),
+        by_price.head(3).alias(f"top3_{column}"),
+    ]
+
+
+def build_daily_aggregates(df):
+    """Aggregate a price history frame (country, date, shop, article, price,
+    price_delivery) to one row per country, article and date."""
+    return (
+        df.lazy()
+        .group_by("country", "article", "date")
+        .agg(
+            *(agg for column in PRICE_COLUMNS for agg in _price_aggs(column)),
+            pl.len().alias("offers"),
+        )
+        .sort("country", "article", "date")
+        .collect()
+    )
+
+
+def load_daily_aggregates(country, article=None, date_range=None):
+    return load_daily_aggregates_versioned(country, article, date_range)[1]
+
+
+def load_daily_aggregates_versioned(country, article=None, date_range=None):
+    """(version, aggregates) with the version of the frames they come from.
+
+    Price days past the end of the materialised table (a history rewritten
+    or re-partitioned without `ingest.py aggregates`) are aggregated on the
+    fly and added, with the prices' version added to the table's.
+    """
+    if not os.path.exists(AGGREGATES_PATH):
+        # Not materialised yet: aggregate the selection on the fly
+        version, prices = scan_prices_versioned(
+            country, date_range=date_range, article=article
+        )
+        return version, build_daily_aggregates(prices)
+    version, daily = load_versioned(
+        AGGREGATES_PATH, country=country, article=article, date_range=date_range
+    )
+    if not partition_months(country) and not os.path.exists(PRICES_PATH):
+        return version, daily
+    start, end = date_range or (None, None)
+    last = load_data(AGGREGATES_PATH, columns=["date"], country=country)
+    last = last["date"].cast(pl.Date).max()
+    if last is not None:
+        start = max(start or last, last + timedelta(days=1))
+    if start is not None and end is not None and end < start:
+        return version, daily
+    prices_version, prices = scan_prices_versioned(
+        country, date_range=(start, end), article=article
+    )
+    if prices.is_empty():
+        return version, daily
+    recent = build_daily_aggregates(prices)
+    return (version, prices_version), pl.concat(
+        [daily, recent], how="vertical_relaxed"
+    )
@@ -0,0 +1,41 @@
+"""Synthetic data and timing shared by the benchmark scripts.
+
+Importing it also puts the repository root on sys.path, so the scripts
+can import the app modules when run as `python benchmarks/<name>.py`.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import polars as pl  # noqa: E402
+
+
+def make_frame(rows, shops=80, countries=("de",)):
+    """`rows` shuffled rows of a price history: one row per shop and day,
+    with country, article, price and a discount share (every 97th null)."""
+    index = pl.int_range(rows, dtype=pl.Int64)
+    return (
+        pl.select(
+            date=pl.date(2020, 1, 1) + pl.duration(days=index // shops),
+            shop=pl.format("shop{}.de", index % shops),
+            country=pl.lit(pl.Series(list(countries))).sample(
+                rows, with_replacement=True, seed=1
+            ),
+            article=1_000_000 + index * 37 % 8_999_999,
+            price=(index * 7919 % 250_000) / 100,
+            disc1=pl.when(index % 97 != 0).then((index % 613) / 1000),
+        )
+        .sample(fraction=1.0, shuffle=True, seed=2)
+    )
+
+
+def best_of(fn, *args, repeat=5):
+    """(fastest of `repeat` runs of fn(*args) in seconds, last result)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
@@ -0,0 +1,72 @@
+"""Time EUR conversion of a multi-country price history.
+
+"nested" is the pl.when(...).otherwise(pl.when(...)) chain the Sanitino
+page used, one level per currency; "to_eur" is currency.to_eur. Both must
+give the same price_eur column up to a cent: Polars divides by a literal
+rate as a multiplication by its reciprocal, which can tip a half-cent the
+other way in the nested chain. The second run adds made-up currencies to
+show how each scales:
+
+    python benchmarks/currency_benchmark.py --rows 5000000
+"""
+import argparse
+
+import polars as pl
+
+from _common import best_of, make_frame
+from currency import COUNTRY_CURRENCIES, country_rates, to_eur
+
+RATES = {"CZK": 25.2, "RON": 4.98, "PLN": 4.26, "HUF": 410.0, "DKK": 7.5, "SEK": 10.7}
+COUNTRIES = ["de", "be", "cz", "fr", "it", "sk", "ro", "es", "pl", "hu", "dk", "se"]
+
+
+def nested(df, rates, currencies):
+    # pl.when(country == c1).then(...).otherwise(pl.when(country == c2)...)
+    expr = pl.col("price")
+    for country, rate in reversed(list(country_rates(rates, currencies).items())):
+        expr = (
+            pl.when(pl.col("country") == country)
+            .then((pl.col("price") / rate).round(2))
+            .otherwise(expr)
+        )
+    return df.with_columns(expr.alias("price_eur"))
+
+
+def table(df, rates, currencies):
+    return df.with_columns(to_eur(rates, currencies=currencies).alias("price_eur"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--extra", type=int, default=24, help="made-up currencies for the scaling run"
+    )
+    args = parser.parse_args()
+
+    extra = [f"x{i}" for i in range(args.extra)]
+    scenarios = [
+        ("sanitino", COUNTRIES, RATES, COUNTRY_CURRENCIES),
+        (
+            f"+{args.extra} currencies",
+            COUNTRIES + extra,
+            {**RATES, **{country.upper(): 1.5 + i for i, country in enumerate(extra)}},
+            {**COUNTRY_CURRENCIES, **{country: country.upper() for country in extra}},
+        ),
+    ]
+    print(f"{'scenario':<16} {'rates':>5} {'nested when':>12} {'to_eur':>10}")
+    for name, countries, rates, currencies in scenarios:
+        df = make_frame(args.rows, countries=countries).select("country", "price")
+        nested_s, expected = best_of(nested, df, rates, currencies, repeat=args.repeat)
+        table_s, result = best_of(table, df, rates, currencies, repeat=args.repeat)
+        cents = (result["price_eur"] - expected["price_eur"]).abs().max()
+        assert cents < 0.011, "conversions differ"
+        print(
+            f"{name:<16} {len(rates):>5} {nested_s * 1000:9.1f} ms"
+            f" {table_s * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
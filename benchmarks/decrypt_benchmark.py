@@ -0,0 +1,118 @@
+"""Compare the legacy whole-file decryption with the streaming decryptor.
+
+Each variant runs in a fresh subprocess so peak RSS is measured in isolation:
+
+    python benchmarks/decrypt_benchmark.py --rows 5000000
+"""
+import argparse
+import io
+import mmap
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import polars as pl
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+import data_store
+
+KEY = b"0123456789abcdef0123456789abcdef"
+
+
+def make_file(path, rows):
+    df = pl.DataFrame(
+        {
+            "date": pl.date_range(
+                pl.date(2020, 1, 1), pl.date(2026, 1, 1), eager=True
+            ).sample(rows, with_replacement=True, seed=1),
+            "country": pl.Series(["de", "fr", "uk"]).sample(
+                rows, with_replacement=True, seed=2
+            ),
+            "shop": pl.Series([f"shop{i}.de" for i in range(60)]).sample(
+                rows, with_replacement=True, seed=3
+            ),
+            "article": pl.int_range(rows, eager=True, dtype=pl.Int32) % 5000,
+            "price": pl.int_range(rows, eager=True) % 997 / 3,
+        }
+    ).with_columns(price_delivery=pl.col("price") + 4.95)
+    buffer = io.BytesIO()
+    df.write_parquet(buffer)
+    iv = os.urandom(16)
+    with open(path, "wb") as f:
+        f.write(iv + AES.new(KEY, AES.MODE_CBC, iv=iv).encrypt(pad(buffer.getvalue(), 16)))
+
+
+def legacy(path, parse=True):
+    with open(path, "rb") as f:
+        encrypted_data = f.read()
+        buffer = io.BytesIO(data_store.decrypt_data(encrypted_data, KEY))
+        return pl.read_parquet(buffer) if parse else buffer
+
+
+def streaming(path, parse=True):
+    if parse:
+        return data_store.read_encrypted(path, KEY)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return data_store.decrypt_into_buffer(m, KEY)
+
+
+def peak_rss_mb():
+    # VmHWM is reset on exec, unlike ru_maxrss which children inherit on Linux
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(name, path, parse):
+    # data_store defers these imports; load them outside the timed region
+    import pyarrow  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+
+    baseline_mb = peak_rss_mb()
+    start = time.perf_counter()
+    {"legacy": legacy, "streaming": streaming}[name](path, parse)
+    elapsed = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    stage = "decrypt+parse" if parse else "decrypt only"
+    print(
+        f"{name:<10} {stage:<14} {elapsed:8.3f} s {peak_mb:10.1f} MB"
+        f" (+{peak_mb - baseline_mb:.1f} MB over imports)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--decrypt-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.path, not args.decrypt_only)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.parquet")
+        make_file(path, args.rows)
+        print(f"encrypted file: {os.path.getsize(path) / 2**20:.1f} MB")
+        print(f"{'variant':<10} {'stage':<14} {'wall':>10} {'peak RSS':>13}")
+        for extra in (["--decrypt-only"], []):
+            for name in ("legacy", "streaming"):
+                subprocess.run(
+                    [sys.executable, __file__, "--variant", name, "--path", path]
+                    + extra,
+                    check=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
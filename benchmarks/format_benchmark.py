@@ -0,0 +1,63 @@
+"""Time formatting a ranked product table for display.
+
+"map_elements" is the per-row Python callback the shop analysis page used
+for the article, price and discount columns; "expressions" is the same
+table through formatting.py. The callbacks are rewritten to give the
+fixed decimals formatting.py produces, and both results must match:
+
+    python benchmarks/format_benchmark.py --rows 100000
+"""
+import argparse
+
+import polars as pl
+
+from _common import best_of, make_frame
+from formatting import article_id, decimal, percent
+
+
+def callbacks(df):
+    return df.with_columns(
+        pl.col("article").map_elements(
+            lambda x: "{:,}".format(x).replace(",", ""),
+            skip_nulls=False,
+            return_dtype=pl.Utf8,
+        ),
+        pl.col("price").map_elements(
+            lambda x: "{:.2f}".format(x).replace(".", ","),
+            skip_nulls=False,
+            return_dtype=pl.Utf8,
+        ),
+        (pl.col("disc1") * 100)
+        .fill_null(0)
+        .map_elements(
+            lambda x: "{:.1f}%".format(x).replace(".", ","),
+            skip_nulls=False,
+            return_dtype=pl.Utf8,
+        ),
+    )
+
+
+def expressions(df):
+    return df.with_columns(
+        article_id(), decimal("price"), percent(pl.col("disc1").fill_null(0))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows).select("article", "price", "disc1")
+    callback_s, expected = best_of(callbacks, df, repeat=args.repeat)
+    expression_s, result = best_of(expressions, df, repeat=args.repeat)
+    assert result.equals(expected), "formatted tables differ"
+    print(f"{'rows':>8} {'map_elements':>13} {'expressions':>12}")
+    print(
+        f"{args.rows:>8} {callback_s * 1000:10.1f} ms {expression_s * 1000:9.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure the cold-start import cost of Intro.py and every page.
+
+Only the top-level imports of each script are timed (what a Streamlit worker
+pays before it can draw the login box). Each script runs in a fresh
+interpreter under `python -X importtime`, from an empty working directory so
+the warm-up thread finds no data to decrypt:
+
+    python benchmarks/import_benchmark.py --budget 900 --top 5
+
+Exits non-zero if any script exceeds the budget (in milliseconds).
+"""
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Should only ever be imported on the code paths that use them
+HEAVY = ("pandas", "pyarrow", "plotly.subplots")
+
+
+def scripts():
+    return [os.path.join(ROOT, "Intro.py")] + sorted(
+        glob.glob(os.path.join(ROOT, "pages", "*.py"))
+    )
+
+
+def top_level_imports(path):
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nodes)
+
+
+def import_times(source):
+    """Return [(depth, module, cumulative_us)] for one cold interpreter."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", source],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((depth, name.strip(), int(cumulative_us)))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=None, help="ms per script")
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    over = []
+    eager = {module: [] for module in HEAVY}
+    for path in scripts():
+        name = os.path.relpath(path, ROOT)
+        times = import_times(top_level_imports(path))
+        # Depth-0 entries add up to the script's total
+        total = sum(c for depth, _, c in times if depth == 0) / 1000
+        print(f"{name:40s} {total:8.1f} ms")
+        heaviest = sorted(times, key=lambda t: t[2], reverse=True)
+        for _, module, cumulative in heaviest[: args.top]:
+            print(f"    {module:36s} {cumulative / 1000:8.1f} ms")
+        modules = {module for _, module, _ in times}
+        for module in HEAVY:
+            if module in modules:
+                eager[module].append(name)
+        if args.budget is not None and total > args.budget:
+            over.append(name)
+    for module, loaded in eager.items():
+        if loaded:
+            print(f"{module} imported eagerly by: {', '.join(loaded)}")
+    if over:
+        print(f"over budget ({args.budget:.0f} ms): {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Time building the price development traces for 1, 8 and 50 shops.
+
+"loop" is the old per-shop filter + sort + to_list; "partition" is
+charts.shop_series + charts.line_traces; "lttb" adds downsampling to
+charts.max_points(). Each builds a full go.Figure; the Plotly JSON sent to
+the browser is reported for the last two:
+
+    python benchmarks/trace_benchmark.py --days 2200 --repeat 5
+"""
+import argparse
+
+import plotly.graph_objects as go
+import polars as pl
+
+from _common import best_of, make_frame
+from charts import line_traces, shop_series
+
+COLORS = ["#7d98a1", "#343499", "#fbe059", "#86d277"]
+
+
+def loop(df, shops):
+    fig = go.Figure()
+    for i, shop in enumerate(shops):
+        shop_data = df.filter(pl.col("shop") == shop).sort("date")
+        fig.add_trace(
+            go.Scatter(
+                x=shop_data["date"].to_list(),
+                y=shop_data["price"].to_list(),
+                name=shop,
+                mode="lines",
+                line=dict(color=COLORS[i % len(COLORS)]),
+            )
+        )
+    return fig
+
+
+def partition(df, shops, downsample=None):
+    fig = go.Figure()
+    fig.add_traces(
+        line_traces(shop_series(df, shops, "price"), COLORS, downsample=downsample)
+    )
+    return fig
+
+
+def lttb(df, shops):
+    return partition(df, shops, downsample="lttb")
+
+
+def payload_mb(fig):
+    return len(fig.to_json()) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=2200, help="history per shop")
+    parser.add_argument("--universe", type=int, default=80, help="shops in the frame")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_frame(args.universe * args.days, shops=args.universe)
+    print(f"{df.height} rows, {args.universe} shops")
+    print(
+        f"{'shops':>5} {'loop':>10} {'partition':>10} {'lttb':>10}"
+        f" {'payload':>10} {'lttb payload':>13}"
+    )
+    for n in (1, 8, 50):
+        shops = [f"shop{i}.de" for i in range(n)]
+        legacy, _ = best_of(loop, df, shops, repeat=args.repeat)
+        vectorised, _ = best_of(partition, df, shops, repeat=args.repeat)
+        reduced, _ = best_of(lttb, df, shops, repeat=args.repeat)
+        print(
+            f"{n:>5} {legacy * 1000:8.1f} ms {vectorised * 1000:8.1f} ms"
+            f" {reduced * 1000:8.1f} ms {payload_mb(partition(df, shops)):7.2f} MB"
+            f" {payload_mb(lttb(df, shops)):10.2f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
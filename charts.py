@@ -0,0 +1,181 @@
+"""Plotly trace builders shared by the pages."""
+import numpy as np
+import plotly.graph_objects as go
+import polars as pl
+
+SCATTERGL_POINTS = 5_000  # traces longer than this are drawn with WebGL
+CHART_WIDTH_PX = 1400  # assumed plot width when sizing downsampled traces
+MAX_POINTS = 2_000  # hard bound on points per downsampled trace
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def max_points(width_px=CHART_WIDTH_PX, method="lttb"):
+    # LTTB needs about one point per pixel, min/max two (a low and a high)
+    per_pixel = 2 if method == "minmax" else 1
+    return min(MAX_POINTS, max(3, width_px * per_pixel))
+
+
+def _flat_run_ends(y):
+    # First and last point of every run of equal prices (NaN breaks runs)
+    keep = np.ones(len(y), dtype=bool)
+    same = y[1:] == y[:-1]
+    keep[1:-1] = ~(same[:-1] & same[1:])
+    return np.flatnonzero(keep)
+
+
+def _lttb(x, y, n):
+    size = len(x)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    # Mean of every bucket (the last point is a bucket of its own), in one pass
+    starts = np.append(edges[:-1], size - 1)
+    counts = np.diff(np.append(starts, size))
+    avg_x = np.add.reduceat(x, starts) / counts
+    avg_y = np.add.reduceat(y, starts) / counts
+    index = np.empty(n, dtype=np.int64)
+    index[0], index[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        start, stop = edges[i], edges[i + 1]
+        x_a, y_a = x[a], y[a]
+        area = np.abs(
+            (x_a - avg_x[i + 1]) * (y[start:stop] - y_a)
+            - (x_a - x[start:stop]) * (avg_y[i + 1] - y_a)
+        )
+        a = start + int(area.argmax())
+        index[i + 1] = a
+    return index
+
+
+def _minmax(y, n):
+    size = len(y)
+    edges = np.linspace(0, size, max(1, (n - 2) // 2) + 1).astype(np.int64)
+    index = [0, size - 1]
+    for start, stop in zip(edges[:-1], edges[1:]):
+        if stop > start:
+            index += [start + int(y[start:stop].argmin()), start + int(y[start:stop].argmax())]
+    return np.unique(index)
+
+
+def downsample_index(x, y, n, method="lttb"):
+    """Positions of at most `n` points of (x, y) that keep the line's shape.
+
+    Prices sit flat for days, so the ends of flat runs are tried first; that
+    drops nothing visible. Only if those still exceed `n` is the series
+    reduced with largest-triangle-three-buckets or per-bucket min/max
+    (below four points min/max falls back to LTTB).
+    `x` may be datetime64; missing prices are skipped in that case.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= n:
+        return np.arange(len(y))
+    runs = _flat_run_ends(y)
+    if len(runs) <= n:
+        return runs
+    valid = np.flatnonzero(np.isfinite(y))
+    if len(valid) <= n:
+        return valid
+    x = np.asarray(x)
+    if x.dtype.kind == "M":
+        x = x.astype("datetime64[s]").astype(np.int64)
+    x, y = x[valid].astype(np.float64), y[valid]
+    # Min/max needs a bucket's low and high besides both ends, so four points
+    if method == "minmax" and n >= 4:
+        return valid[_minmax(y, n)]
+    return valid[_lttb(x, y, n)]
+
+
+def shop_series(df, shops, y, x="date"):
+    """Split `df` into {shop: (x, y)} NumPy arrays in the order of `shops`.
+
+    The frame is filtered, sorted and partitioned once instead of being
+    scanned once per shop; shops without rows get empty arrays so they
+    still appear in the legend.
+    """
+    parts = (
+        df.filter(pl.col("shop").is_in(shops))
+        .select("shop", x, y)
+        .sort("shop", x)
+        .partition_by("shop", as_dict=True)
+    )
+    empty = df.select(x, y).clear()
+    series = {}
+    for shop in shops:
+        part = parts.get((shop,), empty)
+        series[shop] = (part[x].to_numpy(), part[y].to_numpy())
+    return series
+
+
+def downsample_frame(df, y, n, method="lttb", x="date"):
+    # Rows of a sorted single-series frame kept by downsample_index
+    return df[downsample_index(df[x].to_numpy(), df[y].to_numpy(), n, method)]
+
+
+def line_traces(series, colors, webgl=None, downsample=None, points=None):
+    """One line trace per entry of shop_series(), coloured in order.
+
+    webgl=None picks Scattergl for traces longer than SCATTERGL_POINTS.
+    With `downsample` ("lttb" or "minmax") each trace is cut to at most
+    `points` points (default: max_points() for the method).
+    """
+    if downsample is not None:
+        points = points or max_points(method=downsample)
+    traces = []
+    for i, (name, (x, y)) in enumerate(series.items()):
+        if downsample is not None:
+            index = downsample_index(x, y, points, downsample)
+            x, y = x[index], y[index]
+        use_webgl = len(x) > SCATTERGL_POINTS if webgl is None else webgl
+        scatter = go.Scattergl if use_webgl else go.Scatter
+        traces.append(
+            scatter(
+                x=x,
+                y=y,
+                name=name,
+                mode="lines",
+                line=dict(color=colors[i % len(colors)]),
+            )
+        )
+    return traces
+
+
+def lollipop_traces(df, x, y, text, color="color", label_offset=8, width=3):
+    """Stems and value labels of a lollipop chart as a fixed set of traces.
+
+    Every stem of one colour goes into a single line trace, as 0 -> y
+    segments separated by None, and all labels go into one text trace,
+    so the figure does not gain a trace and an annotation per row. Rows
+    with a null `y` are left out; the markers are added by the caller.
+    """
+    df = df.filter(pl.col(y).is_not_null())
+    traces = []
+    for (line_color,), stems in df.partition_by(
+        color, as_dict=True, maintain_order=True
+    ).items():
+        xs = np.full(3 * stems.height, None, dtype=object)
+        ys = np.full(3 * stems.height, None, dtype=object)
+        xs[0::3] = xs[1::3] = stems[x].to_numpy()
+        ys[0::3] = 0
+        ys[1::3] = stems[y].to_numpy()
+        traces.append(
+            go.Scatter(
+                x=xs,
+                y=ys,
+                mode="lines",
+                name="",
+                line=dict(color=line_color, width=width),
+                showlegend=False,
+            )
+        )
+    traces.append(
+        go.Scatter(
+            x=df[x].to_numpy(),
+            y=(df[y] + label_offset).to_numpy(),
+            mode="text",
+            text=df[text].to_list(),
+            textfont=dict(size=14, color=df[color].to_list()),
+            showlegend=False,
+            hoverinfo="skip",
+            cliponaxis=False,
+        )
+    )
+    return traces
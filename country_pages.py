@@ -0,0 +1,416 @@
+"""Country pages: price development (pages 1-3) and product analysis (4-5).
+
+Every country page is the same script with a different country code. The
+pages share one per-article history frame (the country's price history
+joined with tlp.parquet), so switching between the price development and
+product analysis pages of a market reuses it, and adding a market is a
+page file that calls these functions plus an entry in
+lookups.PRICE_COUNTRIES.
+"""
+from datetime import timedelta
+
+import plotly.graph_objects as go
+import polars as pl
+import streamlit as st
+
+from aggregates import load_daily_aggregates_versioned
+from charts import (
+    CHART_WIDTH_PX,
+    downsample_frame,
+    line_traces,
+    max_points,
+    shop_series,
+)
+from data_store import (
+    QUERY_ENGINE,
+    collect,
+    latest_date,
+    load_versioned,
+    scan_prices_versioned,
+    show_timings,
+)
+from frame_cache import derived_frame
+from lookups import PRODUCTS_PATH, price_articles
+
+COUNTRY_NAMES = {
+    "de": "Germany",
+    "fr": "France",
+    "uk": "United Kingdom",
+    "it": "Italy",
+    "es": "Spain",
+    "pl": "Poland",
+}
+
+
+def article_history(country, article, engine=None):
+    """Price history of one article in a country, joined with its HNP row.
+
+    Cached per session on the article and the source versions; `price`
+    comes from the scraped data and `price_right` from tlp.parquet.
+    """
+    # Served without waiting for a reload; keyed on the versions read
+    prices_version, prices = scan_prices_versioned(country)
+    products_version, products = load_versioned(PRODUCTS_PATH)
+
+    def build():
+        df = prices.lazy()
+        hnp = products.lazy()
+        hnp = hnp.with_columns(
+            pl.col("article").cast(pl.Int32),
+            pl.col("year").cast(pl.Int32)
+        )
+
+        history = (
+            df.drop("country")
+            .with_columns(year=pl.col("date").dt.year())
+            .filter(pl.col("article") == article)
+            .join(
+                hnp.select(
+                    pl.col("article", "year", "price", "subcategory", "family", "product")
+                ),
+                on=["article", "year"],
+                how="left",
+                # coalesce=True,
+            )
+            .with_columns(
+                disc1=1 - pl.col("price") / pl.col("price_right"),
+                disc2=1 - pl.col("price_delivery") / pl.col("price_right"),
+            )
+        )
+        return collect(history, label="article history", engine=engine)
+
+    return derived_frame(
+        "article history",
+        (country, article, prices_version, products_version),
+        build,
+    )
+
+
+def price_development(country, downsample="lttb", chart_width=CHART_WIDTH_PX):
+    """Price development page body.
+
+    `downsample` ("lttb", "minmax" or None for every point) bounds each
+    trace to about one point per pixel of `chart_width`; see charts.py.
+    """
+    st.markdown(f"## Price development {COUNTRY_NAMES[country]}")
+    st.divider()
+
+    engine = st.query_params.get("engine", QUERY_ENGINE)
+    df1 = price_articles(country)
+    articles = df1["article"].to_list()
+    products = df1["product"].to_list()
+
+    col1, col2, col3, col4 = st.columns(
+        4, gap="medium"
+    )  # Set up 2 columns for user input
+    with col1:
+        selected_article = st.selectbox("Select an article", articles, index=1)
+
+    with col2:
+        pr_art = st.checkbox("Selection by product name", value=False)
+        if not pr_art:
+            selected_product = df1.filter(pl.col("article") == selected_article)[
+                "product"
+            ].head(1)[0]
+            st.success(selected_product)
+            article = selected_article
+        else:
+            selected_product = st.selectbox("Select a product", products, index=1)
+            article1 = df1.filter(pl.col("product") == selected_product)[
+                "article"
+            ].head(1)[0]
+            st.success(f"{article1}")
+            article = article1
+
+    # Shop and delivery toggles rerun the page; the joined frame is reused
+    filt1_df = article_history(country, article, engine)
+
+    with col4:
+        with_delivery = st.checkbox("Show prices with delivery", value=False)
+
+    if with_delivery:
+        column = "price_delivery"
+    else:
+        column = "price"
+
+    # Read from the materialised daily aggregates
+    daily_version, daily = load_daily_aggregates_versioned(country, article=article)
+
+    def reference_lines():
+        return daily.sort("date").select(
+            "date",
+            pl.col(f"min_{column}").alias("min_price"),
+            pl.col(f"min_{column}_shop").alias("min_price_shop"),
+            pl.col(f"mean_{column}").round(1).alias("mean_price"),
+        )
+
+    reference = derived_frame(
+        "reference lines",
+        (country, article, column, daily_version),
+        reference_lines,
+    )
+    min_price_data = reference.select("date", "min_price", "min_price_shop")
+    mean_price_data = reference.select("date", "mean_price")
+
+    with col3:
+        multiselect_options = filt1_df["shop"].unique().sort().to_list()
+        # Check if the default values exist in the options
+        default_values = ["Amazon", "sanitino.de", "sonono.de"]
+        default_values = [
+            shop for shop in default_values if shop in multiselect_options
+        ][:2]
+        # If no default values exist in the options, choose a different default value
+        if not default_values and len(multiselect_options) > 0:
+            default_values = [multiselect_options[0]]
+        selected_shops = st.multiselect(
+            "Select shops to compare", multiselect_options, default=default_values
+        )
+
+    # Create a line plot
+    fig = go.Figure()
+    colors_p = [
+        "#7d98a1",
+        "#343499",
+        "#fbe059",
+        "#86d277",
+        "#9fb3ba",
+        "#7676bb",
+        "#fbe572",
+        "#a1dd96",
+    ]  # Add more colors if needed
+
+    points = max_points(chart_width, downsample) if downsample else None
+    # One partition pass for all selected shops, NumPy arrays straight to Plotly
+    fig.add_traces(
+        line_traces(
+            shop_series(filt1_df, selected_shops, column),
+            colors_p,
+            downsample=downsample,
+            points=points,
+        )
+    )
+    if downsample:
+        min_price_data = downsample_frame(min_price_data, "min_price", points, downsample)
+        mean_price_data = downsample_frame(
+            mean_price_data, "mean_price", points, downsample
+        )
+    # Add minimum price line
+    fig.add_trace(
+        go.Scatter(
+            x=min_price_data["date"].to_list(),
+            y=min_price_data["min_price"].to_list(),
+            mode="lines",
+            name="Minimum Price",
+            line=dict(dash="dash", color="#818080"),
+            text=min_price_data[
+                "min_price_shop"
+            ].to_list(),  # Add shop name as hover text
+            hoverinfo="text+y",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=mean_price_data["date"].to_list(),
+            y=mean_price_data["mean_price"].to_list(),
+            mode="lines",
+            name="Mean Price",
+            line=dict(
+                dash="dash", color="#FF6133"
+            ),  # Choose a different color for the mean price line
+        )
+    )
+    fig.update_layout(
+        xaxis_title=None,
+        yaxis_title="<b>Price</b>",
+        title=f"<b>Price development for {selected_product}</b>",
+        legend=dict(
+            yanchor="top",
+            y=-0.2,  # Position legend below the graph
+            xanchor="center",
+            x=0.5,
+            orientation="h",  # Horizontal orientation
+            font=dict(size=16, color="#343499"),  # Increase font size
+        ),
+    )
+    st.plotly_chart(fig, width='stretch')
+    show_timings("article history: session cache")
+
+
+def create_chart(df, title, column, column2):  # Create a bar chart of the 'price' column
+    smallest_price = df[column2].min()
+    df = df.with_columns(surplus=pl.col(column2) - smallest_price)
+    chart = go.Figure(
+        data=[
+            go.Bar(
+                x=df["shop"],
+                y=[smallest_price] * len(df),
+                name=column2,
+                marker_color="#d1d1e8",
+            ),
+            go.Bar(
+                x=df["shop"], y=df["surplus"], name="Surplus", marker_color="#F09577"
+            ),
+        ]
+    )
+
+    chart.add_trace(
+        go.Scatter(  # Add 'price' values at the bottom of the bars
+            x=df["shop"],
+            y=[0.1] * len(df),  # Set 'y' to a small number
+            mode="text",  # Set the mode to 'text'
+            text=[
+                f"{val:.1f}" for val in df[column2]
+            ],  # Set the 'text' to the 'price' values
+            textposition="top center",  # Position the text at the top of the 'y' position
+            textfont=dict(family="Arial", size=14, color="#575757"),
+            showlegend=False,  # Do not show this trace in the legend
+        )
+    )
+
+    chart.add_trace(
+        go.Scatter(  # Add 'disc1' to the y2 axis with only markers
+            x=df["shop"],
+            y=df[column],
+            name=column,
+            yaxis="y2",
+            mode="markers+text",  # Add 'text' to the mode
+            marker=dict(
+                color="#343499",
+                size=15,
+                symbol="line-ew-open",
+                line=dict(width=3),
+            ),  # Increase the size of the markers
+            text=[
+                f"{val:.1%}" for val in df[column]
+            ],  # Format 'disc1' as a percentage with 1 decimal place
+            textposition="top center",  # Position the text above the markers
+            textfont=dict(family="Arial", size=14, color="#575757"),
+        )
+    )
+
+    chart.update_layout(  # Update the layout to include the secondary y-axis and remove all gridlines
+        title_text=title,
+        height=600,
+        barmode="stack",
+        yaxis=dict(title=column2, showgrid=False),
+        yaxis2=dict(
+            title="",
+            overlaying="y",
+            side="right",
+            showticklabels=False,
+            ticks="",
+            showgrid=False,
+            range=[0, max(df[column]) + 0.05],
+        ),  # Adjust the range for 'y2'
+        xaxis=dict(showgrid=False),
+        showlegend=False,  # Remove the legend
+    )
+    return chart
+
+
+def product_analysis(country):
+    st.markdown(f"## Product analysis {COUNTRY_NAMES[country]}")
+    st.divider()
+
+    engine = st.query_params.get("engine", QUERY_ENGINE)
+    df1 = price_articles(country)
+    articles = df1["article"].to_list()
+    products = df1["product"].to_list()
+
+    st.markdown("###### Select a product for analysis.")
+    col1, col2 = st.columns([2, 5], gap="large")
+    with col1:
+        article = st.selectbox(
+            "Select an article from the list",
+            articles,
+            index=1,
+        )
+
+        pr_art = st.checkbox("Select product by product name", value=False)
+
+        if not pr_art:
+            product = df1.filter(pl.col("article") == article)["product"].head(1)[0]
+            st.success(product)
+        else:
+            product = st.selectbox(
+                "Select a product from the list",
+                products,
+                index=1,
+            )
+            article = df1.filter(pl.col("product") == product)["article"].head(1)[0]
+            st.success(f"{article}")
+
+        st.divider()
+        date1 = st.date_input(
+            "Select a date",
+            latest_date(country),
+            key="date_range1",
+        )
+        st.divider()
+        check = st.checkbox("Select prices with delivery", value=False)
+        st.divider()
+
+    df_de_prod = article_history(country, article, engine)
+
+    with col2:
+        df_sel_date = df_de_prod.filter(pl.col("date") == date1)
+
+        column = "disc2" if check else "disc1"
+        column2 = "price_delivery" if check else "price"
+
+        graph1 = create_chart(
+            df_sel_date.sort(by=column, descending=True).head(12),
+            f"Shops and prices for {product} with discounts from HNP",
+            column,
+            column2,
+        )
+        st.plotly_chart(graph1, width='stretch')
+
+    st.divider()
+
+    col11, col12 = st.columns([1, 3], gap="large")
+
+    with col11:
+        st.markdown(
+            "###### Preselected dates for analysis correspond to previous day, previous week, and previous month. You can use any dates for analysis by selecting the checkbox."
+        )
+        check_date = st.checkbox(
+            "Select days for analysis", value=False, key="check_days"
+        )
+        date2 = st.date_input(
+            "Select date 1", df_de_prod["date"].max(), key="date_range2"
+        )
+        date3 = st.date_input(
+            "Select date 2", df_de_prod["date"].max(), key="date_range3"
+        )
+        date4 = st.date_input(
+            "Select date 3", df_de_prod["date"].max(), key="date_range4"
+        )
+        date5 = st.date_input(
+            "Select date 4", df_de_prod["date"].max(), key="date_range5"
+        )
+
+    with col12:
+        if not check_date:
+            previous_day = date1 - timedelta(
+                days=1
+            )  # Calculate the previous day, previous week, and previous month dates
+            previous_week = date1 - timedelta(weeks=1)
+            previous_month = date1 - timedelta(days=30)
+        else:
+            date1 = date2
+            previous_day = date3
+            previous_week = date4
+            previous_month = date5
+        # Filter the dataframe for the desired dates
+        filtered_df = df_de_prod.filter(
+            pl.col("date").is_in([date1, previous_day, previous_week, previous_month])
+        ).sort("date", descending=False)
+
+        pivot_df = filtered_df.pivot(
+            values=column2, index="shop", columns="date", aggregate_function="min"
+        )
+        max_date = pivot_df.columns[-1]
+        pivot_df = pivot_df.sort(by=max_date, descending=False, nulls_last=True)
+        st.dataframe(pivot_df.head(10), width='stretch', hide_index=True)
+    show_timings("article history: session cache")
@@ -0,0 +1,133 @@
+"""Conversion of local marketplace prices to EUR.
+
+Rates are given per currency as units per EUR (the numbers entered on the
+Sanitino and Amazon pages). Each country is mapped to its rate in one
+vectorised pass; countries that price in EUR keep their price unchanged.
+
+With daily rates imported into FX_PATH (`python ingest.py fx rates.csv`)
+every price is converted at the rate of its own date instead; the rates
+entered on the page only fill days the table does not cover.
+"""
+import os
+
+import polars as pl
+
+from data_store import FX_PATH, load_versioned
+
+COUNTRY_CURRENCIES = {
+    "cz": "CZK",
+    "dk": "DKK",
+    "hu": "HUF",
+    "pl": "PLN",
+    "ro": "RON",
+    "se": "SEK",
+    "uk": "GBP",
+}
+RATE_HELP = "Used for days without a daily rate in the FX table"
+FX_TOLERANCE = "7d"  # oldest daily rate used for a price (weekends, holidays)
+
+_lookups = {}  # (dataset path, currencies) -> (version, frame)
+
+
+def country_rates(rates, currencies=COUNTRY_CURRENCIES):
+    # {country: units per EUR} for the countries whose currency has a rate
+    return {
+        country: rates[currency]
+        for country, currency in currencies.items()
+        if currency in rates
+    }
+
+
+def to_eur(rates, price="price", country="country", currencies=COUNTRY_CURRENCIES):
+    """Expression for `price` in EUR, rounded to cents where it is converted.
+
+    `rates` maps currency codes to units per EUR, e.g. {"CZK": 25.2};
+    `currencies` maps country codes to currency codes.
+    """
+    rate = pl.col(country).replace_strict(
+        country_rates(rates, currencies), default=None, return_dtype=pl.Float64
+    )
+    # coalesce evaluates the lookup once; when/then/otherwise would run it twice
+    return pl.coalesce((pl.col(price) / rate).round(2), pl.col(price))
+
+
+def fx_table():
+    # (version, daily rates: date, currency, rate in units per EUR), or
+    # (None, None) until imported
+    if not os.path.exists(FX_PATH):
+        return None, None
+    return load_versioned(FX_PATH)
+
+
+def _build_lookup(df, fx, currencies):
+    days = (
+        df.select("country", pl.col("date").cast(pl.Date))
+        .unique()
+        .with_columns(
+            currency=pl.col("country").replace_strict(
+                currencies, default=None, return_dtype=pl.Utf8
+            )
+        )
+    )
+    if fx is None:
+        return days.select("country", "date", fx_rate=pl.lit(None, pl.Float64))
+    fx = fx.select(
+        pl.col("date").cast(pl.Date), "currency", pl.col("rate").cast(pl.Float64)
+    ).sort("date")
+    return (
+        days.sort("date")
+        .join_asof(
+            fx,
+            on="date",
+            by="currency",
+            strategy="backward",
+            tolerance=FX_TOLERANCE,
+            check_sortedness=False,  # both sides are sorted by date above
+        )
+        .select("country", "date", fx_rate="rate")
+    )
+
+
+def fx_lookup(path, currencies=COUNTRY_CURRENCIES):
+    """(country, date, fx_rate) for every country and day of a dataset.
+
+    Each day gets the latest rate on or before it, at most FX_TOLERANCE
+    old. The table has one row per country and day rather than per price,
+    and is built once per version of the dataset and of FX_PATH and shared
+    by every session.
+    """
+    return fx_lookup_versioned(path, currencies)[1]
+
+
+def fx_lookup_versioned(path, currencies=COUNTRY_CURRENCIES):
+    # (version, fx_lookup table); the version of the frames it was built from
+    data_version, df = load_versioned(path)
+    rates_version, fx = fx_table()
+    version = (data_version, rates_version)
+    key = (os.path.normpath(path), tuple(currencies.items()))
+    cached = _lookups.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, _build_lookup(df, fx, currencies))
+        _lookups[key] = cached
+    return cached
+
+
+def with_price_eur(df, path, rates, currencies=COUNTRY_CURRENCIES):
+    """Add `price_eur` to rows of the dataset at `path` at their date's rate.
+
+    Rows without a daily rate fall back to `rates` as in to_eur.
+    """
+    lookup = fx_lookup(path, currencies).rename({"date": "_fx_date"})
+    if isinstance(df, pl.LazyFrame):
+        lookup = lookup.lazy()
+    return (
+        df.with_columns(_fx_date=pl.col("date").cast(pl.Date))
+        .join(lookup, on=["country", "_fx_date"], how="left", maintain_order="left")
+        .with_columns(
+            price_eur=pl.coalesce(
+                (pl.col("price") / pl.col("fx_rate")).round(2),
+                to_eur(rates, currencies=currencies),
+            )
+        )
+        .drop("_fx_date", "fx_rate")
+    )
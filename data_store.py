@@ -0,0 +1,587 @@
+import base64
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import polars as pl
+import toml
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+
+SECRETS_PATH = "./.streamlit/secrets.toml"
+PRICES_PATH = "./data/Ien.parquet"
+PRICES_DIR = "./data/Ien"  # hive layout: country=de/month=2026-10/*.parquet
+AGGREGATES_PATH = "./data/Ien_daily.parquet"  # see aggregates.py
+RANKS_PATH = "./data/Ien_ranks.parquet"  # see ranks.py
+FX_PATH = "./data/fx.parquet"  # daily exchange rates, see currency.py
+CHUNK_SIZE = 1 << 20  # bytes decrypted per step, a multiple of the AES block
+SEGMENTED_MAGIC = b"PAENCRG1"  # files written by ingest.write_segmented
+STATS_COLUMNS = ("country", "article", "date")
+MAX_SELECTIONS = 64
+LOAD_WORKERS = 4  # concurrent file loads in load_many
+QUERY_ENGINE = os.environ.get("PRICEAPP_QUERY_ENGINE", "lazy")  # or "eager"
+
+_key = None
+_frames = {}  # normalised path -> (version, frame, segments)
+_selections = OrderedDict()  # (path, columns, filters) -> (version, frame)
+_locks = {}
+_locks_guard = threading.Lock()
+_timings = threading.local()  # per script-run thread
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="data-refresh")
+_pending = set()  # background reloads in flight
+_loader = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="data-load")
+
+
+def data_key():
+    # Read lazily so tools that pass their own key never need the secrets file
+    global _key
+    if _key is None:
+        config = toml.load(SECRETS_PATH)
+        _key = config["secrets"]["data_key"].encode("utf-8")
+    return _key
+
+
+def decrypt_data(data, key):
+    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
+    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
+    return pt
+
+
+def file_version(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def segments_dir(path):
+    # Daily segments appended by `python ingest.py append` live next to the file
+    return os.path.splitext(path)[0] + ".segments"
+
+
+def read_manifest(path):
+    manifest = os.path.join(segments_dir(path), "manifest.json")
+    if not os.path.exists(manifest):
+        return ()
+    with open(manifest) as f:
+        return tuple(json.load(f)["segments"])
+
+
+def dataset_version(path):
+    """Version of a dataset: the base file plus its segment manifest, if any."""
+    manifest = os.path.join(segments_dir(path), "manifest.json")
+    if not os.path.exists(manifest):
+        return (file_version(path), None)
+    return (file_version(path), file_version(manifest))
+
+
+def decrypt_into_buffer(data, key):
+    """Decrypt IV + AES-CBC ciphertext into a preallocated Arrow buffer.
+
+    `data` may be any bytes-like object (typically a memory-mapped file); it
+    is decrypted chunk by chunk straight into the output buffer, and padding
+    is stripped by slicing, so the plaintext is the only full-size copy.
+    """
+    import pyarrow as pa  # deferred: only needed once data is decrypted
+
+    view = memoryview(data)
+    try:
+        size = len(view) - AES.block_size
+        if size <= 0 or size % AES.block_size:
+            raise ValueError("Ciphertext length is not a multiple of the block size")
+        cipher = AES.new(key, AES.MODE_CBC, iv=bytes(view[: AES.block_size]))
+        out = pa.allocate_buffer(size)
+        out_view = memoryview(out)
+        try:
+            for start in range(0, size, CHUNK_SIZE):
+                stop = min(start + CHUNK_SIZE, size)
+                cipher.decrypt(
+                    view[AES.block_size + start : AES.block_size + stop],
+                    output=out_view[start:stop],
+                )
+            padding = out_view[-1]
+            if not 1 <= padding <= AES.block_size or any(
+                b != padding for b in out_view[-padding:]
+            ):
+                raise ValueError("Padding is incorrect.")
+        finally:
+            out_view.release()
+    finally:
+        view.release()
+    return out.slice(0, size - padding)
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted(value)
+    return [value]
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _filters(country=None, article=None, date_range=None):
+    # Normalised, hashable form of the loader predicates
+    filters = []
+    if country is not None:
+        filters.append(("country", tuple(_as_list(country))))
+    if article is not None:
+        filters.append(("article", tuple(int(a) for a in _as_list(article))))
+    if date_range is not None:
+        filters.append(("date", tuple(_as_date(d) for d in date_range)))
+    return tuple(filters)
+
+
+def _filter_expr(filters):
+    exprs = []
+    for column, values in filters:
+        if column == "date":
+            start, end = values
+            date = pl.col("date").cast(pl.Date)
+            if start is not None:
+                exprs.append(date >= start)
+            if end is not None:
+                exprs.append(date <= end)
+        else:
+            exprs.append(pl.col(column).is_in(list(values)))
+    return pl.all_horizontal(exprs) if exprs else None
+
+
+def _group_matches(stats, filters):
+    # Row-group pruning on the min/max statistics stored in the file index
+    for column, values in filters:
+        if column not in stats:
+            continue
+        low, high = stats[column]
+        if column == "date":
+            start, end = values
+            if start is not None and high < start.isoformat():
+                return False
+            if end is not None and low > end.isoformat():
+                return False
+        elif not any(low <= value <= high for value in values):
+            return False
+    return True
+
+
+def _read_index(m, key):
+    # Layout: magic | uint32 index length | encrypted JSON index | row groups
+    (length,) = struct.unpack_from("<I", m, len(SEGMENTED_MAGIC))
+    start = len(SEGMENTED_MAGIC) + 4
+    with memoryview(m)[start : start + length] as view:
+        index = json.loads(decrypt_into_buffer(view, key).to_pybytes())
+    return index, start + length
+
+
+def _decode_parquet(buffer, columns=None):
+    # Polars' own reader on the decrypted buffer; going through pyarrow and
+    # from_arrow was slower and peaked higher on string columns
+    import pyarrow as pa
+
+    return pl.read_parquet(pa.BufferReader(buffer), columns=columns)
+
+
+def _read_segmented(m, key, columns=None, filters=()):
+    import pyarrow as pa
+
+    index, data_start = _read_index(m, key)
+    needed = None
+    if columns is not None:
+        needed = list(dict.fromkeys([*columns, *(c for c, _ in filters)]))
+    expr = _filter_expr(filters)
+    parts = []
+    for group in index["row_groups"]:
+        if not _group_matches(group["stats"], filters):
+            continue
+        offset = data_start + group["offset"]
+        with memoryview(m)[offset : offset + group["length"]] as view:
+            buffer = decrypt_into_buffer(view, key)
+        part = _decode_parquet(buffer, needed)
+        if expr is not None:
+            part = part.filter(expr)
+        parts.append(part)
+    if not parts:
+        schema = pa.ipc.read_schema(pa.py_buffer(base64.b64decode(index["schema"])))
+        return pl.from_arrow(schema.empty_table()).select(columns or pl.all())
+    df = pl.concat(parts, rechunk=False)
+    return df.select(columns) if columns is not None else df
+
+
+def read_encrypted(path, key=None, columns=None, filters=()):
+    key = key or data_key()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if m[: len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+            return _read_segmented(m, key, columns, filters)
+        buffer = decrypt_into_buffer(m, key)
+    # Legacy single-blob file: nothing to prune, decode and filter afterwards
+    return select_rows(_decode_parquet(buffer), columns, filters)
+
+
+def _file_last_date(path, key):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if m[: len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+            index, _ = _read_index(m, key)
+            groups = index["row_groups"]
+            highs = [g["stats"]["date"][1] for g in groups if "date" in g["stats"]]
+            return date.fromisoformat(max(highs)) if highs else None
+    # Legacy single-blob file: no statistics, decode the date column
+    return read_encrypted(path, key, columns=["date"])["date"].cast(pl.Date).max()
+
+
+def last_date(path, key=None):
+    """Latest date of a dataset, from the date statistics in the row-group
+    index of its base file and of its last appended segment (segments are
+    appended in date order). Nothing but the indexes is decrypted."""
+    key = key or data_key()
+    segments = read_manifest(path)
+    paths = [path] + [os.path.join(segments_dir(path), name) for name in segments[-1:]]
+    dates = [d for d in (_file_last_date(p, key) for p in paths) if d is not None]
+    return max(dates) if dates else None
+
+
+def select_rows(df, columns=None, filters=()):
+    expr = _filter_expr(filters)
+    if expr is not None:
+        df = df.filter(expr)
+    return df.select(columns) if columns is not None else df
+
+
+def _read_segments(path, segments, columns=None, filters=()):
+    directory = segments_dir(path)
+    return [
+        read_encrypted(os.path.join(directory, name), columns=columns, filters=filters)
+        for name in segments
+    ]
+
+
+def _read_dataset(path, segments, columns=None, filters=()):
+    parts = [read_encrypted(path, columns=columns, filters=filters)]
+    parts += _read_segments(path, segments, columns, filters)
+    if len(parts) == 1:
+        return parts[0]
+    return pl.concat(parts, how="vertical_relaxed", rechunk=False)
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _in_background(task, fn, *args):
+    # At most one pending reload per task; the caller keeps the current data
+    with _locks_guard:
+        if task in _pending:
+            return
+        _pending.add(task)
+
+    def run():
+        try:
+            fn(*args)
+        finally:
+            with _locks_guard:
+                _pending.discard(task)
+
+    _refresher.submit(run)
+
+
+def load_data(
+    path, columns=None, country=None, article=None, date_range=None, consistent=False
+):
+    """Return the process-wide frame for an encrypted parquet file.
+
+    The file is decrypted once per version (mtime + size); every caller gets a
+    zero-copy clone of the same frame, so pages share one copy in memory.
+    Daily segments listed in the dataset's manifest are appended, and when
+    only new segments appear just those are decrypted and concatenated
+    onto the cached frame.
+
+    When a new version appears on disk the cached frame keeps being served
+    while the new one loads in a background thread; it is swapped in
+    atomically once ready, so no request waits for the reload. Only the
+    very first load of a file is synchronous. Results derived from the
+    frame should be cached under the version load_versioned() returns with
+    it, not under dataset_version(), which may already be newer. With
+    consistent=True a changed file is reloaded before returning instead;
+    only tools that write the data back (ingest.py) need that.
+
+    With `columns` or a predicate (`country`, `article` as a value or list,
+    `date_range` as an inclusive (start, end) pair of dates, either end may
+    be None) only the matching selection is returned. For files written by
+    ingest.write_segmented only the row groups whose statistics match are
+    decrypted and only the requested columns are decoded; the last
+    MAX_SELECTIONS selections are kept in memory.
+    """
+    cached = _load(path, columns, _filters(country, article, date_range), consistent)
+    return cached[1].clone()
+
+
+def load_versioned(
+    path, columns=None, country=None, article=None, date_range=None, consistent=False
+):
+    """(version, frame) as load_data; `version` is the dataset_version() the
+    frame was read at, older than the file on disk while a reload runs."""
+    cached = _load(path, columns, _filters(country, article, date_range), consistent)
+    return cached[0], cached[1].clone()
+
+
+def _load(path, columns, filters, consistent):
+    path = os.path.normpath(path)
+    version = dataset_version(path)
+    if columns is None and not filters:
+        cached = _frames.get(path)
+        if cached is None or (consistent and cached[0] != version):
+            cached = _load_full(path)
+        elif cached[0] != version:
+            _in_background(("full", path), _load_full, path)
+        return cached
+
+    columns = tuple(columns) if columns is not None else None
+    selection_key = (path, columns, filters)
+    with _locks_guard:
+        cached = _selections.get(selection_key)
+        if cached is not None:
+            _selections.move_to_end(selection_key)
+    if cached is None or (consistent and cached[0] != version):
+        cached = _load_selection(path, columns, filters)
+    elif cached[0] != version:
+        _in_background(
+            ("selection", *selection_key), _load_selection, path, columns, filters
+        )
+    return cached
+
+
+def load_many(
+    paths, columns=None, country=None, article=None, date_range=None, consistent=False
+):
+    """Load several datasets concurrently; returns {path: frame} in input order.
+
+    Decryption and parquet decoding run in native code that releases the
+    GIL, so a cold load costs roughly the slowest file rather than the sum.
+    The selection arguments and `consistent` are applied to every path as
+    in load_data.
+    """
+    loaded = load_many_versioned(
+        paths, columns, country, article, date_range, consistent
+    )
+    return {path: frame for path, (_, frame) in loaded.items()}
+
+
+def load_many_versioned(
+    paths, columns=None, country=None, article=None, date_range=None, consistent=False
+):
+    # load_many, as {path: (version, frame)} like load_versioned
+    paths = list(dict.fromkeys(paths))
+    selection = dict(
+        columns=columns,
+        country=country,
+        article=article,
+        date_range=date_range,
+        consistent=consistent,
+    )
+    if len(paths) == 1:
+        return {paths[0]: load_versioned(paths[0], **selection)}
+    futures = {
+        path: _loader.submit(load_versioned, path, **selection) for path in paths
+    }
+    return {path: future.result() for path, future in futures.items()}
+
+
+def _load_selection(path, columns, filters):
+    version = dataset_version(path)
+    full = _frames.get(path)
+    if full is not None and full[0] == version:
+        df = select_rows(full[1], columns, filters)
+    else:
+        df = _read_dataset(path, read_manifest(path), columns, filters)
+    cached = (version, df)
+    with _locks_guard:
+        _selections[(path, columns, filters)] = cached
+        while len(_selections) > MAX_SELECTIONS:
+            _selections.popitem(last=False)
+    return cached
+
+
+def _load_full(path):
+    with _lock_for(path):
+        version = dataset_version(path)
+        cached = _frames.get(path)
+        if cached is not None and cached[0] == version:
+            return cached
+        segments = read_manifest(path)
+        if (
+            cached is not None
+            and cached[0][0] == version[0]
+            and segments[: len(cached[2])] == cached[2]
+        ):
+            # Same base file, segments only appended: read the new ones
+            new = _read_segments(path, segments[len(cached[2]) :])
+            frame = pl.concat([cached[1], *new], how="vertical_relaxed", rechunk=False)
+        else:
+            frame = _read_dataset(path, segments)
+        cached = (version, frame, segments)
+        _frames[path] = cached  # atomic swap; readers hold their own clones
+        return cached
+
+
+def partition_months(country, root=PRICES_DIR):
+    directory = os.path.join(root, f"country={country}")
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name.split("=", 1)[1] for name in os.listdir(directory) if name.startswith("month=")
+    )
+
+
+def _partition_files(country, month, root):
+    directory = os.path.join(root, f"country={country}", f"month={month}")
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.endswith(".parquet")
+    ]
+
+
+def scan_prices(
+    country,
+    date_range=None,
+    article=None,
+    columns=None,
+    root=PRICES_DIR,
+    consistent=False,
+):
+    """Return the price history of one country, reading only the partitions
+    whose month overlaps `date_range`.
+
+    Falls back to the single PRICES_PATH file when the partitioned layout
+    has not been written (see `python ingest.py partition`). `consistent`
+    is passed on to load_data.
+    """
+    return scan_prices_versioned(
+        country, date_range, article, columns, root, consistent
+    )[1]
+
+
+def scan_prices_versioned(
+    country,
+    date_range=None,
+    article=None,
+    columns=None,
+    root=PRICES_DIR,
+    consistent=False,
+):
+    """(version, frame) as scan_prices; `version` identifies the frames read,
+    as load_versioned does for one file."""
+    months = partition_months(country, root)
+    if not months:
+        return load_versioned(
+            PRICES_PATH,
+            columns=columns,
+            country=country,
+            article=article,
+            date_range=date_range,
+            consistent=consistent,
+        )
+
+    if date_range is not None:
+        start, end = date_range
+        selected = [
+            month
+            for month in months
+            if (start is None or month >= start.strftime("%Y-%m"))
+            and (end is None or month <= end.strftime("%Y-%m"))
+        ]
+    else:
+        selected = months
+    file_columns = None
+    if columns is not None:
+        file_columns = [c for c in columns if c != "country"]
+
+    paths = [path for month in selected for path in _partition_files(country, month, root)]
+    if not paths:
+        # Nothing overlaps: read an empty, correctly typed selection instead
+        paths = _partition_files(country, months[-1], root)[-1:]
+        date_range = (date.max, None)
+    parts = load_many_versioned(
+        paths,
+        columns=file_columns,
+        article=article,
+        date_range=date_range,
+        consistent=consistent,
+    )
+    version = tuple((path, part[0]) for path, part in parts.items())
+    df = pl.concat(
+        [frame for _, frame in parts.values()], how="vertical_relaxed", rechunk=False
+    )
+    df = df.with_columns(country=pl.lit(country))
+    return version, df.select(columns) if columns is not None else df
+
+
+def prices_version(country, root=PRICES_DIR):
+    # Version of everything scan_prices(country) reads for the full history
+    months = partition_months(country, root)
+    if not months:
+        return dataset_version(PRICES_PATH)
+    return tuple(
+        (path, dataset_version(path))
+        for month in months
+        for path in _partition_files(country, month, root)
+    )
+
+
+def latest_date(country, root=PRICES_DIR):
+    months = partition_months(country, root)
+    if not months:
+        return load_data(PRICES_PATH, columns=["date"], country=country)["date"].max()
+    paths = _partition_files(country, months[-1], root)
+    return max(load_data(path, columns=["date"])["date"].max() for path in paths)
+
+
+def collect(*queries, label="query", engine=None):
+    """Collect one or more LazyFrame page queries in a single optimised pass.
+
+    Several queries are collected together so shared subplans run once.
+    engine="eager" (or PRICEAPP_QUERY_ENGINE=eager) runs the same plans with
+    the optimiser switched off, node by node like the old eager code, so
+    both can be timed on the same request; see query_timings().
+    """
+    engine = engine or QUERY_ENGINE
+    start = time.perf_counter()
+    if engine == "eager":
+        optimizations = pl.QueryOptFlags.none()
+        frames = [query.collect(optimizations=optimizations) for query in queries]
+    else:
+        frames = pl.collect_all(queries)
+    elapsed = time.perf_counter() - start
+    if not hasattr(_timings, "entries"):
+        _timings.entries = []
+    _timings.entries.append((label, engine, elapsed))
+    return frames[0] if len(frames) == 1 else frames
+
+
+def query_timings():
+    # (label, engine, seconds) for the queries collected since the last call
+    entries = getattr(_timings, "entries", [])
+    _timings.entries = []
+    return entries
+
+
+def show_timings(empty=""):
+    """Caption the page with query_timings() when the URL has ?engine=...;
+    `empty` is shown when nothing was collected on this run."""
+    import streamlit as st  # only the pages need it, not ingest.py
+
+    if "engine" in st.query_params:
+        st.caption(
+            ", ".join(
+                f"{label}: {seconds * 1000:.1f} ms ({mode})"
+                for label, mode, seconds in query_timings()
+            )
+            or empty
+        )
@@ -0,0 +1,63 @@
+"""Display formatting of table and label columns as Polars expressions.
+
+Numbers are shown the German way, with a decimal comma and a fixed number
+of decimals ("12,50", "7,5%"); article numbers are plain digits. Every
+helper returns an expression, so a whole column is formatted in one
+vectorised pass instead of a Python callback per row. Missing and non-finite
+values are shown as empty text.
+"""
+import polars as pl
+
+DECIMAL = ","
+
+
+def _col(column):
+    return pl.col(column) if isinstance(column, str) else column
+
+
+def article_id(column="article"):
+    # Article numbers as digits only, without a thousands separator
+    return _col(column).cast(pl.Int64).cast(pl.Utf8)
+
+
+def _round_half_even(value, scale):
+    # value * scale rounded the way "{:.Nf}" rounds: on the exact binary value,
+    # ties to even. Dekker's product gives the rounding error of value * scale,
+    # which decides the cases where the float product lands on a tie.
+    product = value * scale
+    split = value * 134217729.0
+    high = split - (split - value)
+    error = (high * scale - product) + (value - high) * scale
+    whole = product.floor()
+    above = (product - whole - 0.5) + error
+    # Non-strict: NaN and infinities (e.g. a share over a zero price) become null
+    whole = whole.cast(pl.Int64, strict=False)
+    return whole + ((above > 0) | ((above == 0) & (whole % 2 == 1))).cast(pl.Int64)
+
+
+def _fixed(column, decimals, separator, suffix=""):
+    value = _col(column).cast(pl.Float64)
+    scale = 10**decimals
+    scaled = _round_half_even(value.abs(), scale)
+    # A sign expression derived from the column keeps the column's name
+    sign = (value < 0).replace_strict({True: "-"}, default="", return_dtype=pl.Utf8)
+    parts = [sign, (scaled // scale).cast(pl.Utf8)]
+    if decimals:
+        # Adding `scale` pads the fraction with zeros: 5 -> "105" -> "05"
+        fraction = (scaled % scale + scale).cast(pl.Utf8).str.slice(1)
+        parts += [pl.lit(separator), fraction]
+    # concat_str is null if the value is, so the suffix goes too
+    return pl.concat_str(parts + [pl.lit(suffix)]).fill_null("")
+
+
+def decimal(column, decimals=2, separator=DECIMAL):
+    """`column` as text with exactly `decimals` decimals, e.g. 1234.5 -> "1234,50".
+
+    Rounds like Python's "{:.2f}"; nulls, NaN and infinities become "".
+    """
+    return _fixed(column, decimals, separator)
+
+
+def percent(column, decimals=1, separator=DECIMAL):
+    # Share (0.075) as a percentage label ("7,5%")
+    return _fixed(_col(column) * 100, decimals, separator, "%")
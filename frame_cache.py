@@ -0,0 +1,37 @@
+"""Per-session cache of frames derived from the shared datasets.
+
+A widget change reruns the whole page; frames built from the same inputs
+(dataset version, country, article, price column, ...) are taken from
+here instead of being filtered and joined again. Each session keeps its
+own LRU in st.session_state, capped by entry count and by the estimated
+size of the frames it holds.
+"""
+from collections import OrderedDict
+
+import streamlit as st
+
+MAX_ENTRIES = 32
+MAX_BYTES = 256 << 20  # per session
+
+_STATE_KEY = "_derived_frames"
+
+
+def derived_frame(name, key, build):
+    """Return build() for (name, key), reusing the session's cached result.
+
+    `key` must be hashable and include everything the frame depends on,
+    dataset versions included, so a reload on disk simply misses.
+    """
+    cache = st.session_state.setdefault(_STATE_KEY, OrderedDict())
+    cache_key = (name, key)
+    if cache_key in cache:
+        cache.move_to_end(cache_key)
+        return cache[cache_key][1]
+    frame = build()
+    cache[cache_key] = (frame.estimated_size(), frame)
+    total = sum(size for size, _ in cache.values())
+    # The newest entry is always kept, even if it alone exceeds the cap
+    while len(cache) > 1 and (len(cache) > MAX_ENTRIES or total > MAX_BYTES):
+        _, (size, _) = cache.popitem(last=False)
+        total -= size
+    return frame
@@ -0,0 +1,329 @@
+"""Write encrypted datasets in the formats read by data_store.
+
+    python ingest.py convert ./data/Ien.parquet
+    python ingest.py partition ./data/Ien.parquet
+    python ingest.py aggregates ./data/Ien.parquet
+    python ingest.py ranks ./data/Ien.parquet
+    python ingest.py append ./data/Ien.parquet scraped_2026-10-18.parquet
+    python ingest.py compact ./data/Ien.parquet
+    python ingest.py fx eurofxref-hist.csv
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import struct
+
+import polars as pl
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+from aggregates import build_daily_aggregates
+from ranks import build_rank_table
+from data_store import (
+    AGGREGATES_PATH,
+    FX_PATH,
+    PRICES_DIR,
+    PRICES_PATH,
+    RANKS_PATH,
+    SEGMENTED_MAGIC,
+    STATS_COLUMNS,
+    data_key,
+    last_date,
+    load_data,
+    read_encrypted,
+    read_manifest,
+    segments_dir,
+)
+
+ROW_GROUP_ROWS = 50_000
+
+
+def encrypt_data(data, key):
+    iv = os.urandom(AES.block_size)
+    cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+    return iv + cipher.encrypt(pad(data, AES.block_size))
+
+
+def _stats(df):
+    stats = {}
+    for column in STATS_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column].cast(pl.Date) if column == "date" else df[column]
+        low, high = values.min(), values.max()
+        if low is None:
+            continue
+        if column == "date":
+            low, high = low.isoformat(), high.isoformat()
+        stats[column] = [low, high]
+    return stats
+
+
+def _replace_file(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_segmented(df, path, key=None, row_group_rows=ROW_GROUP_ROWS):
+    """Encrypt `df` as independently encrypted row groups with an encrypted index.
+
+    Rows are sorted by country, article and date so the min/max statistics in
+    the index let data_store.load_data skip groups that cannot match.
+    """
+    key = key or data_key()
+    sort_columns = [c for c in STATS_COLUMNS if c in df.columns]
+    if sort_columns:
+        df = df.sort(sort_columns)
+
+    blobs, groups, offset = [], [], 0
+    for start in range(0, max(df.height, 1), row_group_rows):
+        part = df.slice(start, row_group_rows)
+        buffer = io.BytesIO()
+        part.write_parquet(buffer)
+        blob = encrypt_data(buffer.getvalue(), key)
+        groups.append(
+            {
+                "offset": offset,
+                "length": len(blob),
+                "rows": part.height,
+                "stats": _stats(part),
+            }
+        )
+        blobs.append(blob)
+        offset += len(blob)
+
+    schema = df.head(0).to_arrow().schema.serialize().to_pybytes()
+    index = {
+        "schema": base64.b64encode(schema).decode("ascii"),
+        "row_groups": groups,
+    }
+    header = encrypt_data(json.dumps(index).encode("utf-8"), key)
+    _replace_file(
+        path,
+        SEGMENTED_MAGIC + struct.pack("<I", len(header)) + header + b"".join(blobs),
+    )
+
+
+def convert(path, output=None, row_group_rows=ROW_GROUP_ROWS):
+    # Legacy single-blob file -> row-group segmented file (in place by default)
+    df = read_encrypted(path)
+    write_segmented(df, output or path, row_group_rows=row_group_rows)
+
+
+def partition(path=PRICES_PATH, root=PRICES_DIR, row_group_rows=ROW_GROUP_ROWS):
+    """Split the price history into a hive layout, country=xx/month=YYYY-MM/.
+
+    Partition values are encoded in the directory names only; every
+    partition is written with write_segmented. Appended segments are read
+    together with the base file; the day files append_day added to a
+    partition are removed once its rewritten part-0 covers them.
+    """
+    df = load_data(path, consistent=True).with_columns(
+        month=pl.col("date").dt.strftime("%Y-%m")
+    )
+    for (country, month), part in df.partition_by(
+        ["country", "month"], as_dict=True
+    ).items():
+        directory = os.path.join(root, f"country={country}", f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        write_segmented(
+            part.drop("country", "month"),
+            os.path.join(directory, "part-0.parquet"),
+            row_group_rows=row_group_rows,
+        )
+        # part-0 now holds the days append_day wrote as separate files
+        for name in os.listdir(directory):
+            if name.startswith("day-") and name.endswith(".parquet"):
+                os.remove(os.path.join(directory, name))
+
+
+def aggregates(path=PRICES_PATH, output=AGGREGATES_PATH):
+    # Materialise the per-day min/mean/top-shop table read by the price pages
+    write_segmented(build_daily_aggregates(load_data(path, consistent=True)), output)
+
+
+def ranks(path=PRICES_PATH, output=RANKS_PATH):
+    # Materialise the per-day shop ranks read by the shop analysis pages
+    write_segmented(build_rank_table(load_data(path, consistent=True)), output)
+
+
+def _write_manifest(path, segments):
+    os.makedirs(segments_dir(path), exist_ok=True)
+    manifest = json.dumps({"segments": list(segments)}, indent=1)
+    _replace_file(os.path.join(segments_dir(path), "manifest.json"), manifest.encode())
+
+
+def append_segment(df, path, name):
+    """Add `df` to the dataset at `path` as a new encrypted segment.
+
+    The segment is written before the manifest that lists it, so readers
+    never see a half-written segment.
+    """
+    segments = read_manifest(path)
+    if name in segments:
+        raise ValueError(f"Segment {name} is already part of {path}")
+    os.makedirs(segments_dir(path), exist_ok=True)
+    write_segmented(df, os.path.join(segments_dir(path), name))
+    _write_manifest(path, [*segments, name])
+
+
+def read_day(day_path):
+    # Scraper output, either plain or already encrypted parquet
+    with open(day_path, "rb") as f:
+        plain = f.read(4) == b"PAR1"
+    return pl.read_parquet(day_path) if plain else read_encrypted(day_path)
+
+
+def append_day(day_path, path=PRICES_PATH, root=PRICES_DIR):
+    """Append one scraped day without rewriting the history.
+
+    For the price history the day is also added to its country/month
+    partitions and, when materialised, to the daily aggregates and ranks,
+    so a daily refresh costs O(one day). Days must be newer than
+    everything in the dataset, compacted days included.
+    """
+    df = read_day(day_path)
+    if os.path.exists(path):
+        # From the row-group statistics: nothing of the history is decrypted
+        latest = last_date(path)
+        first = df["date"].cast(pl.Date).min()
+        if latest is not None and first <= latest:
+            raise ValueError(
+                f"{day_path} starts on {first}, not after {path} ends ({latest})"
+            )
+    day = df["date"].cast(pl.Date).max().isoformat()
+    name = f"{day}.parquet"
+    append_segment(df, path, name)
+
+    if os.path.normpath(path) != os.path.normpath(PRICES_PATH):
+        return
+    if os.path.isdir(root):
+        months = df.with_columns(month=pl.col("date").dt.strftime("%Y-%m"))
+        for (country, month), part in months.partition_by(
+            ["country", "month"], as_dict=True
+        ).items():
+            directory = os.path.join(root, f"country={country}", f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            write_segmented(
+                part.drop("country", "month"), os.path.join(directory, f"day-{name}")
+            )
+    if os.path.exists(AGGREGATES_PATH):
+        append_segment(build_daily_aggregates(df), AGGREGATES_PATH, name)
+    if os.path.exists(RANKS_PATH):
+        # Ranks compare offers of the same day only, so the new day is ranked alone
+        append_segment(build_rank_table(df), RANKS_PATH, name)
+
+
+def compact(path):
+    """Fold the appended segments back into the base file.
+
+    Run it while no append is in flight. The new base is written first,
+    then the emptied manifest, then the segments are deleted, so a crash
+    at any point loses no day; between the first two writes readers
+    briefly see the appended days twice.
+    """
+    segments = read_manifest(path)
+    if not segments:
+        return
+    write_segmented(load_data(path, consistent=True), path)
+    _write_manifest(path, [])
+    for name in segments:
+        os.remove(os.path.join(segments_dir(path), name))
+
+
+def import_fx(csv_path, output=FX_PATH):
+    """Merge daily exchange rates into the encrypted FX table.
+
+    Accepts a long CSV (date, currency, rate) or the ECB wide history
+    (Date, USD, JPY, ...); rates are units per EUR. Imported rows replace
+    existing ones for the same date and currency.
+    """
+    df = pl.read_csv(csv_path, infer_schema_length=0, null_values=["N/A", ""])
+    if "currency" not in df.columns:
+        df = df.rename({"Date": "date"}).unpivot(
+            index="date", variable_name="currency", value_name="rate"
+        )
+    df = df.select(
+        pl.col("date").str.to_date(),
+        pl.col("currency").str.strip_chars().str.to_uppercase(),
+        pl.col("rate").cast(pl.Float64),
+    ).drop_nulls()
+    if os.path.exists(output):
+        df = pl.concat([read_encrypted(output), df], how="vertical_relaxed")
+    df = df.unique(["date", "currency"], keep="last").sort("currency", "date")
+    write_segmented(df, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the encrypted datasets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser(
+        "convert", help="rewrite an encrypted file as encrypted row groups"
+    )
+    convert_parser.add_argument("path")
+    convert_parser.add_argument("--output")
+    convert_parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS)
+
+    partition_parser = commands.add_parser(
+        "partition", help="split the price history by country and month"
+    )
+    partition_parser.add_argument("path", nargs="?", default=PRICES_PATH)
+    partition_parser.add_argument("--root", default=PRICES_DIR)
+    partition_parser.add_argument(
+        "--row-group-rows", type=int, default=ROW_GROUP_ROWS
+    )
+
+    aggregates_parser = commands.add_parser(
+        "aggregates", help="materialise the daily price aggregates"
+    )
+    aggregates_parser.add_argument("path", nargs="?", default=PRICES_PATH)
+    aggregates_parser.add_argument("--output", default=AGGREGATES_PATH)
+
+    ranks_parser = commands.add_parser(
+        "ranks", help="materialise the per-day shop price ranks"
+    )
+    ranks_parser.add_argument("path", nargs="?", default=PRICES_PATH)
+    ranks_parser.add_argument("--output", default=RANKS_PATH)
+
+    append_parser = commands.add_parser(
+        "append", help="append one scraped day as a new encrypted segment"
+    )
+    append_parser.add_argument("path")
+    append_parser.add_argument("day")
+    append_parser.add_argument("--root", default=PRICES_DIR)
+
+    compact_parser = commands.add_parser(
+        "compact", help="merge appended segments into the base file"
+    )
+    compact_parser.add_argument("path")
+
+    fx_parser = commands.add_parser(
+        "fx", help="import daily exchange rates (units per EUR) from a CSV"
+    )
+    fx_parser.add_argument("csv")
+    fx_parser.add_argument("--output", default=FX_PATH)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.path, args.output, args.row_group_rows)
+    elif args.command == "partition":
+        partition(args.path, args.root, args.row_group_rows)
+    elif args.command == "aggregates":
+        aggregates(args.path, args.output)
+    elif args.command == "ranks":
+        ranks(args.path, args.output)
+    elif args.command == "append":
+        append_day(args.day, args.path, args.root)
+    elif args.command == "compact":
+        compact(args.path)
+    elif args.command == "fx":
+        import_fx(args.csv, args.output)
+
+
+if __name__ == "__main__":
+    main()
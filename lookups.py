@@ -0,0 +1,114 @@
+"""Article -> product tables and shop lists behind the pages' pickers.
+
+Each table is built once per version of its source datasets and shared by
+every session; warmup.py builds them at server start. Sources are read
+without waiting for a reload in progress, and a table is keyed on the
+versions of the frames it was built from, so it is rebuilt once the
+reloaded frames are served.
+"""
+import polars as pl
+
+from currency import fx_lookup
+from data_store import load_versioned, scan_prices_versioned
+from ranks import rank_table
+
+PRICE_COUNTRIES = ("de", "fr", "uk")
+PRODUCTS_PATH = "./data/tlp.parquet"
+SANITINO_PATH = "./data/Sen.parquet"
+ANCHORS_PATH = "./data/an.parquet"
+AMAZON_PATH = "./data/Aen.parquet"
+
+_tables = {}  # name -> (version, frame)
+
+
+def _cached(name, version, build):
+    cached = _tables.get(name)
+    if cached is None or cached[0] != version:
+        cached = (version, build())
+        _tables[name] = cached
+    return cached[1]
+
+
+def _articles(df):
+    # article as Int32, the type of the price histories
+    return df.with_columns(pl.col("article").cast(pl.Int32))
+
+
+def price_articles(country):
+    # Articles seen in a country's price history (pages 1-5)
+    prices_version, prices = scan_prices_versioned(country)
+    products_version, products = load_versioned(PRODUCTS_PATH)
+
+    def build():
+        return (
+            prices.select(pl.col("article"))
+            .unique()
+            .sort("article")
+            .join(
+                _articles(products).select(pl.col("article", "product")),
+                on="article",
+                how="left",
+            )
+            .unique()
+            .sort("article")
+        )
+
+    return _cached(f"prices_{country}", (prices_version, products_version), build)
+
+
+def price_shops(country):
+    # Shops of a country's whole price history (shop pickers, pages 6-7), so
+    # the options do not change with the selected date
+    version, prices = scan_prices_versioned(country, columns=["shop"])
+    return _cached(
+        f"shops_{country}", version, lambda: prices["shop"].unique().sort().to_list()
+    )
+
+
+def sanitino_articles():
+    sanitino_version, sanitino = load_versioned(SANITINO_PATH)
+    anchors_version, anchors = load_versioned(ANCHORS_PATH)
+
+    def build():
+        return (
+            sanitino.select("article")
+            .unique()
+            .join(_articles(anchors), on="article", how="left")
+            .select(["article", "product"])
+            .unique(["article"])
+            .sort("article")
+        )
+
+    return _cached("sanitino", (sanitino_version, anchors_version), build)
+
+
+def amazon_articles():
+    amazon_version, amazon = load_versioned(AMAZON_PATH)
+    products_version, products = load_versioned(PRODUCTS_PATH)
+
+    def build():
+        return (
+            amazon.select("article")
+            .unique()
+            .join(
+                _articles(products).select(["article", "product"]),
+                on="article",
+                how="left",
+            )
+            .select(["article", "product"])
+            .unique(["article"])
+            .sort("article")
+        )
+
+    return _cached("amazon", (amazon_version, products_version), build)
+
+
+def warmup_tasks():
+    return [(price_articles, country) for country in PRICE_COUNTRIES] + [
+        (sanitino_articles,),
+        (amazon_articles,),
+        (fx_lookup, SANITINO_PATH),
+        (fx_lookup, AMAZON_PATH),
+        (price_shops, "de"),  # shop analysis pages
+        (rank_table, "de"),
+    ]
@@ -1,28 +1,46 @@
+import hashlib
+import hmac
+import os
 import streamlit as st
-import pandas as pd
-import toml
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-import pyarrow.parquet as pq
-import io
-
-config = toml.load("./.streamlit/secrets.toml")
-key = config["secrets"]["data_key"].encode('utf-8')
-
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
-with open('./data/Logs.parquet', 'rb') as f:
-    encrypted_data = f.read()
-    buffer = io.BytesIO(decrypt_data(encrypted_data, key))
-    df = pd.read_parquet(buffer, engine='pyarrow')
+from data_store import dataset_version, load_versioned
+from warmup import start_warmup
+
+CREDENTIALS_PATH = './data/Logs.parquet'
+HASH_ITERATIONS = 10_000
+
+_index = None  # (version, {username: (salt, password hash)})
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, HASH_ITERATIONS)
+
+def credential_index():
+    # Built once per version of the credentials file; only salted hashes are kept
+    global _index
+    if _index is None or _index[0] != dataset_version(CREDENTIALS_PATH):
+        # Read through a reload (the file is tiny) so a just-added user can log in
+        version, df = load_versioned(CREDENTIALS_PATH, consistent=True)
+        entries = {}
+        for user, password in zip(df['usernames'].to_list(), df['password'].to_list()):
+            if user is not None and password is not None:
+                salt = os.urandom(16)
+                entries[user] = (salt, _hash_password(password, salt))
+        _index = (version, entries)
+    return _index[1]
+
+def check_password(user, password):
+    entry = credential_index().get(user)
+    if entry is None:
+        return None
+    salt, password_hash = entry
+    return hmac.compare_digest(_hash_password(password, salt), password_hash)
+
+# Every page imports this module, so this runs once per server process
+start_warmup(tasks=[(credential_index,)])
 
 def creds_entered():
-    if st.session_state.user.strip() in df['usernames'].values:
-        i = df['usernames'].tolist().index(st.session_state.user.strip())
-        if st.session_state.password.strip() == df['password'][i]:
+    valid = check_password(st.session_state.user.strip(), st.session_state.password.strip())
+    if valid is not None:
+        if valid:
             st.session_state['authenticated'] = True
         else:
             st.session_state['authenticated'] = False
@@ -2,21 +2,20 @@ import polars as pl
 import streamlit as st
 import plotly.graph_objects as go
 from middleware import authenticate_user
+from charts import line_traces
+from formatting import article_id, decimal, percent
+from lookups import price_shops
+from ranks import day_ranks, rank_history
+from shop_stats import price_change_counts
+from data_store import (
+    QUERY_ENGINE,
+    collect,
+    latest_date,
+    load_data,
+    scan_prices,
+    show_timings,
+)
 from datetime import date, timedelta
-import toml
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-import io
-
-config = toml.load("./.streamlit/secrets.toml")
-key = config["secrets"]["data_key"].encode("utf-8")
-
-
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
 
 # Page configuration
 st.set_page_config(
@@ -50,14 +49,6 @@ st.markdown(hide_st_style, unsafe_allow_html=True)
 
 if authenticate_user():
 
-    @st.cache_data
-    def load_data(path):
-        with open(path, "rb") as f:
-            encrypted_data = f.read()
-            buffer = io.BytesIO(decrypt_data(encrypted_data, key))
-            df = pl.read_parquet(buffer)
-        return df
-
     def custom_metric(label, value):
         st.markdown(
             f"""
@@ -69,37 +60,38 @@ if authenticate_user():
             unsafe_allow_html=True,
         )
 
-    df = load_data("./data/Ien.parquet")
-    hnp = load_data("./data/tlp.parquet")
+    engine = st.query_params.get("engine", QUERY_ENGINE)
+    hnp = load_data("./data/tlp.parquet").lazy()
     hnp = hnp.with_columns(pl.col("article").cast(pl.Int32),
                           pl.col("year").cast(pl.Int32))
 
-    df_de = (
-        df.filter(pl.col("country") == "de")
-        .drop("country")
-        .with_columns(year=pl.col("date").dt.year())
-    )
-
     st.markdown("## Analysis per e-traders")
     st.divider()
 
     col1, col2, col3, col4 = st.columns(4, gap="medium")
-    with col1:
-        shop1 = st.selectbox(
-            "Select an e-trader", df_de["shop"].unique().sort().to_list(), index=0
+    with col4:
+        date1 = st.date_input(
+            "Select a date",
+            latest_date("de"),
+            key="date_range1",
         )
+
+    # Only the month-ago..date1 window is analysed, so only its partitions are read
+    df = scan_prices("de", date_range=(date1 - timedelta(days=30), date1)).lazy()
+    df_de = (
+        df.drop("country")
+        .with_columns(year=pl.col("date").dt.year())
+    )
+    shops = price_shops("de")
+
+    with col1:
+        shop1 = st.selectbox("Select an e-trader", shops, index=0)
     with col2:
         shop2 = st.selectbox(
-            "Select an e-trader", df_de["shop"].unique().sort().to_list(), index=1
+            "Select an e-trader", shops, index=min(1, max(len(shops) - 1, 0))
         )
     with col3:
         disc = st.checkbox("Show for prices with delivery", value=False)
-    with col4:
-        date1 = st.date_input(
-            "Select a date",
-            df_de["date"].max(),
-            key="date_range1",
-        )
 
     df_de_shop = (
         df_de.filter(pl.col("shop").is_in([shop1, shop2]))
@@ -134,63 +126,30 @@ if authenticate_user():
     previous_month = date1 - timedelta(days=30)
     dates = [previous_month, previous_week, previous_day, last_day]
 
-    df_de_show = df_de_shop.filter(pl.col("date").is_in(dates))
-    df_de_disc = df_de_shop.filter(pl.col("date") == date1)
+    # The shop history is shared by both selections and computed once
+    df_de_show, df_de_disc, df_de = collect(
+        df_de_shop.filter(pl.col("date").is_in(dates)),
+        df_de_shop.filter(pl.col("date") == date1),
+        df_de,
+        label="shop analysis",
+        engine=engine,
+    )
     column2 = "price_delivery" if disc else "price"
 
-    def price_changes(shop):
-        pivot_df = (
-            df_de_show.filter(pl.col("shop") == shop)
-            .with_columns(pl.col("date").cast(pl.Utf8))
-            .pivot(
-                values=column2,
-                index="product",
-                columns="date",
-                aggregate_function="first",
-            )
-        )
-
-        # Ensure there are enough columns to perform the analysis
-        if len(pivot_df.columns) < 5:
-            # Not enough columns for month/week/day/last comparisons
-            return [0, 0, 0, 0, 0, 0, pivot_df]
-
-        last_column_name = pivot_df.columns[-1]
-
-        for col_name in pivot_df.columns[1:-1]:  # Exclude the first ('product') and the last column
-            pivot_df = pivot_df.with_columns(
-                (pl.col(col_name) - pl.col(last_column_name)).alias(col_name)
-            )
-
-        day_ago_positive = pivot_df.filter(
-            pl.col(pivot_df.columns[-2]) > 0
-        ).height  # Count positive and negative values in 'day ago' column
-        day_ago_negative = pivot_df.filter(pl.col(pivot_df.columns[-2]) < 0).height
-
-        week_ago_positive = pivot_df.filter(
-            pl.col(pivot_df.columns[-3]) > 0
-        ).height  # Count positive and negative values in 'week ago' column
-        week_ago_negative = pivot_df.filter(pl.col(pivot_df.columns[-3]) < 0).height
-
-        month_ago_positive = pivot_df.filter(
-            pl.col(pivot_df.columns[-4]) > 0
-        ).height  # Count positive and negative values in 'month ago' column
-        month_ago_negative = pivot_df.filter(pl.col(pivot_df.columns[-4]) < 0).height
-        return [
-            day_ago_positive,
-            day_ago_negative,
-            week_ago_positive,
-            week_ago_negative,
-            month_ago_positive,
-            month_ago_negative,
-            pivot_df,
-        ]
+    # Increase/decrease counts for both shops and all periods in one pass
+    changes = price_change_counts(
+        df_de_show,
+        [shop1, shop2],
+        column2,
+        last_day,
+        {"day": previous_day, "week": previous_week, "month": previous_month},
+    )
 
     column = "disc1" if not disc else "disc2"
-    df_de_sorted = df_de.sort(["date", column2]).with_columns(
-        pl.col(column2).rank("min").over(["date", "article"]).alias("rank")
-    )
-    shop_rank_counts = df_de_sorted.group_by(["shop", "rank"]).len()
+    # Ranks are read from the prebuilt rank table instead of ranked per rerun
+    ranks = day_ranks("de", date1, column2)
+    df_de_sorted = df_de.join(ranks, on=["article", "shop"], how="left")
+    shop_rank_counts = ranks.group_by(["shop", "rank"]).len()
     shop_rank_counts_1 = (
         shop_rank_counts.filter(pl.col("shop") == shop1, pl.col("rank").is_not_null())
         .sort("rank")
@@ -239,93 +198,26 @@ if authenticate_user():
         st.write(f"Rank counts for {shop2}")
         st.dataframe(shop_rank_counts_2, hide_index=True, use_container_width=True)
 
+    display_columns = [
+        article_id(),
+        decimal(column2),
+        percent(pl.col(column).fill_null(0)),
+    ]
     with coln2:
-        df_de_sorted1_ranked = df_de_sorted1_ranked.with_columns(
-            pl.col("article").map_elements(
-                lambda x: "{:,}".format(x).replace(",", ""),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            pl.col(column2).map_elements(
-                lambda x: "{:,}".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            (pl.col(column) * 100)
-            .fill_null(0)
-            .map_elements(
-                lambda x: "{:.1f}%".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-        )
+        df_de_sorted1_ranked = df_de_sorted1_ranked.with_columns(display_columns)
         st.write(f"Products with lowest prices for {shop1} (rank = 1)")
         st.dataframe(df_de_sorted1_ranked, hide_index=True, use_container_width=True)
         st.divider()
-        df_de_sorted12_ranked = df_de_sorted12_ranked.with_columns(
-            pl.col("article").map_elements(
-                lambda x: "{:,}".format(x).replace(",", ""),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            pl.col(column2).map_elements(
-                lambda x: "{:,}".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            (pl.col(column) * 100)
-            .fill_null(0)
-            .map_elements(
-                lambda x: "{:.1f}%".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-        )
+        df_de_sorted12_ranked = df_de_sorted12_ranked.with_columns(display_columns)
         st.write(f"Products with lowest prices for {shop1} (rank = 2)")
         st.dataframe(df_de_sorted12_ranked, hide_index=True, use_container_width=True)
 
     with coln3:
-        df_de_sorted2_ranked = df_de_sorted2_ranked.with_columns(
-            pl.col("article").map_elements(
-                lambda x: "{:,}".format(x).replace(",", ""),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            pl.col(column2).map_elements(
-                lambda x: "{:,}".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            (pl.col(column) * 100)
-            .fill_null(0)
-            .map_elements(
-                lambda x: "{:.1f}%".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-        )
+        df_de_sorted2_ranked = df_de_sorted2_ranked.with_columns(display_columns)
         st.write(f"Products with lowest prices for {shop2} (rank = 1)")
         st.dataframe(df_de_sorted2_ranked, hide_index=True, use_container_width=True)
         st.divider()
-        df_de_sorted22_ranked = df_de_sorted22_ranked.with_columns(
-            pl.col("article").map_elements(
-                lambda x: "{:,}".format(x).replace(",", ""),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            pl.col(column2).map_elements(
-                lambda x: "{:,}".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-            (pl.col(column) * 100)
-            .fill_null(0)
-            .map_elements(
-                lambda x: "{:.1f}%".format(x).replace(".", ","),
-                skip_nulls=False,
-                return_dtype=pl.Utf8,
-            ),
-        )
+        df_de_sorted22_ranked = df_de_sorted22_ranked.with_columns(display_columns)
         st.write(f"Products with lowest prices for {shop2} (rank = 2)")
         st.dataframe(df_de_sorted22_ranked, hide_index=True, use_container_width=True)
 
@@ -367,60 +259,89 @@ if authenticate_user():
     st.plotly_chart(fig, use_container_width=True)
     st.divider()
 
+    # Daily rank counts over the whole history, read from the rank summary
+    history = rank_history("de", [shop1, shop2], column2, ranks=(1, 2))
+    series = {
+        f"{shop} (rank {rank})": (part["date"].to_numpy(), part["count"].to_numpy())
+        for (shop, rank), part in history.partition_by(
+            "shop", "rank", as_dict=True, maintain_order=True
+        ).items()
+    }
+    fig = go.Figure()
+    fig.add_traces(line_traces(series, ["#343499", "#7676bb", "#7d98a1", "#9fb3ba"]))
+    fig.update_layout(
+        title_text=f"Products at rank 1 and 2 over time for {shop1} and {shop2}",
+        yaxis_title="Quantity of products",
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        legend=dict(
+            yanchor="bottom",
+            y=0.95,
+            xanchor="right",
+            x=1,
+            orientation="h",
+            font=dict(size=16, color="#343499"),
+        ),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.divider()
+
     col11, col12, col13, col14, col15, col16, col17 = st.columns([2, 2, 2, 1, 2, 2, 2])
     with col11:
         custom_metric(
             f"Price increases since day before {date1.strftime('%d.%m.%Y')} for {shop1}",
-            price_changes(shop1)[0],
+            changes[shop1]["day_up"],
         )
         custom_metric(
             f"Price decreases since day before {date1.strftime('%d.%m.%Y')} for {shop1}",
-            price_changes(shop1)[1],
+            changes[shop1]["day_down"],
         )
     with col12:
         custom_metric(
             f"Price increases since week before {date1.strftime('%d.%m.%Y')} for {shop1}",
-            price_changes(shop1)[2],
+            changes[shop1]["week_up"],
         )
         custom_metric(
             f"Price decreases since week before {date1.strftime('%d.%m.%Y')} for {shop1}",
-            price_changes(shop1)[3],
+            changes[shop1]["week_down"],
         )
     with col13:
         custom_metric(
             f"Price increases since month before {date1.strftime('%d.%m.%Y')} for {shop1}",
-            price_changes(shop1)[4],
+            changes[shop1]["month_up"],
         )
         custom_metric(
             f"Price decreases since month before {date1.strftime('%d.%m.%Y')} for {shop1}",
-            price_changes(shop1)[5],
+            changes[shop1]["month_down"],
         )
     with col14:
         st.empty()
     with col15:
         custom_metric(
             f"Price increases since day before {date1.strftime('%d.%m.%Y')} for {shop2}",
-            price_changes(shop2)[0],
+            changes[shop2]["day_up"],
         )
         custom_metric(
             f"Price decreases since day before {date1.strftime('%d.%m.%Y')} for {shop2}",
-            price_changes(shop2)[1],
+            changes[shop2]["day_down"],
         )
     with col16:
         custom_metric(
             f"Price increases since week before {date1.strftime('%d.%m.%Y')} for {shop2}",
-            price_changes(shop2)[2],
+            changes[shop2]["week_up"],
         )
         custom_metric(
             f"Price decreases since week before {date1.strftime('%d.%m.%Y')} for {shop2}",
-            price_changes(shop2)[3],
+            changes[shop2]["week_down"],
         )
     with col17:
         custom_metric(
             f"Price increases since month before {date1.strftime('%d.%m.%Y')} for {shop2}",
-            price_changes(shop2)[4],
+            changes[shop2]["month_up"],
         )
         custom_metric(
             f"Price decreases since month before {date1.strftime('%d.%m.%Y')} for {shop2}",
-            price_changes(shop2)[5],
+            changes[shop2]["month_down"],
         )
+
+    show_timings()
@@ -2,21 +2,19 @@ import polars as pl
 import streamlit as st
 import plotly.graph_objects as go
 from middleware import authenticate_user
+from formatting import article_id
+from lookups import price_shops
+from ranks import day_ranks
+from shop_stats import price_gaps
+from data_store import (
+    QUERY_ENGINE,
+    collect,
+    latest_date,
+    load_data,
+    scan_prices,
+    show_timings,
+)
 from datetime import date, timedelta
-import toml
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-import io
-
-config = toml.load("./.streamlit/secrets.toml")
-key = config["secrets"]["data_key"].encode("utf-8")
-
-
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
 
 # Page configuration
 st.set_page_config(
@@ -50,14 +48,6 @@ st.markdown(hide_st_style, unsafe_allow_html=True)
 
 if authenticate_user():
 
-    @st.cache_data
-    def load_data(path):
-        with open(path, "rb") as f:
-            encrypted_data = f.read()
-            buffer = io.BytesIO(decrypt_data(encrypted_data, key))
-            df = pl.read_parquet(buffer)
-        return df
-
     def custom_metric(label, value):
         st.markdown(
             f"""
@@ -69,24 +59,33 @@ if authenticate_user():
             unsafe_allow_html=True,
         )
 
-    df = load_data("./data/Ien.parquet")
-    hnp = load_data("./data/tlp.parquet")
+    engine = st.query_params.get("engine", QUERY_ENGINE)
+    hnp = load_data("./data/tlp.parquet").lazy()
     hnp = hnp.with_columns(pl.col("article").cast(pl.Int32),
                           pl.col("year").cast(pl.Int32))
 
-    df_de = (
-        df.filter(pl.col("country") == "de")
-        .drop("country")
-        .with_columns(year=pl.col("date").dt.year())
-    )
-
     st.markdown("## Analysis per e-traders")
     st.divider()
 
     col1, col2, col3, col4, col5 = st.columns(5, gap="medium")
+    with col5:
+        date1 = st.date_input(
+            "Select a date",
+            latest_date("de"),
+            key="date_range1",
+        )
+
+    # Only the selected day is analysed, so only its month partition is read
+    df = scan_prices("de", date_range=(date1, date1)).lazy()
+    df_de = (
+        df.drop("country")
+        .with_columns(year=pl.col("date").dt.year())
+    )
+    shops = price_shops("de")
+
     with col1:
         shop1 = st.selectbox(
-            "Select an e-trader", df_de["shop"].unique().sort().to_list(), index=1
+            "Select an e-trader", shops, index=min(1, max(len(shops) - 1, 0))
         )
     with col2:
         min_diff = st.slider(
@@ -104,12 +103,7 @@ if authenticate_user():
         )
     with col4:
         disc = st.checkbox("Show for prices with delivery", value=False)
-    with col5:
-        date1 = st.date_input(
-            "Select a date",
-            df_de["date"].max(),
-            key="date_range1",
-        )
+        all_shops = st.checkbox("Show for all e-traders", value=False)
 
     df_de = (
         df_de.filter(pl.col("date") == date1)
@@ -126,74 +120,39 @@ if authenticate_user():
     )
     column2 = "price_delivery" if disc else "price"
 
-    df_de_sorted = df_de.sort(["date", column2]).with_columns(
-        pl.col(column2).rank("min").over(["date", "article"]).alias("rank")
-    )
-
-    df_de_sorted = df_de.sort(["date", column2]).with_columns(
-        pl.col(column2).rank("min").over(["date", "article"]).alias("rank")
-    )
-
-    art = (
-        df_de_sorted.filter(pl.col("shop") == shop1, pl.col("rank") == 1)
-        .get_column("article")
-        .to_list()
-    )
-    df_de_sorted2 = (
-        df_de_sorted.filter(pl.col("article").is_in(art), pl.col("rank") <= rank + 1)
-        .select(["article", "shop", "product", column2])
-        .sort(by=["article", "shop"], descending=[True, False], nulls_last=True)
-    )
-
-    df_de_sorted2_pivot = df_de_sorted2.pivot(
-        values=column2,
-        index=["article", "product"],
-        columns="shop",
-        aggregate_function="first",
-    )
-
-    columns = (
-        df_de_sorted2_pivot.columns
-    )  # work with columns of pivoted table to fix the order
-    fixed_columns = ["article", "product"]
-    shop_columns = [col for col in columns if col not in fixed_columns]
-    try:
-        shop_columns.remove(f"{shop1}")
-        shop_columns.insert(0, f"{shop1}")
-    except:
-        pass
-    new_columns_order = fixed_columns + shop_columns
-    df_de_sorted22_pivot = df_de_sorted2_pivot.select(new_columns_order)
-
-    df_unp = (
-        df_de_sorted22_pivot.melt(
-            id_vars=["article", "product", f"{shop1}"],
-            value_name="price",
-            variable_name="shop",
-        )
-        .filter(pl.col("price").is_not_null())
-        .with_columns((pl.col("price") - pl.col(f"{shop1}")).alias("diff"))
-    )
-    df_unp2 = df_unp.with_columns(
-        prmax=pl.col("diff").max().over(["article"]),
-    ).filter(pl.col("diff") >= min_diff)
-    df_unpivoted = (
-        df_unp.join(df_unp2, "article", how="left")
-        .filter(pl.col("prmax").is_not_null())
-        .sort(["prmax", "diff"], descending=[True, False])
-        .select(["article", "product", f"{shop1}", "shop", "price", "diff"])
-        .unique(subset=["article", "shop"], keep="first", maintain_order=True)
-    )
-    df_unpivoted_rend = df_unpivoted.with_columns(
-        pl.col("article").map_elements(
-            lambda x: "{:,}".format(x).replace(",", ""),
-            skip_nulls=False,
-            return_dtype=pl.Utf8,
+    # Ranks are read from the prebuilt rank table; the gaps of every shop at
+    # rank 1 come from one long-format window pass
+    gaps = collect(
+        price_gaps(
+            df_de.join(
+                day_ranks("de", date1, column2).lazy(),
+                on=["article", "shop"],
+                how="left",
+            ),
+            column2,
+            max_rank=rank + 1,
+            min_diff=min_diff,
         ),
+        label="price gaps",
+        engine=engine,
     )
+    if all_shops:
+        df_gaps = gaps.rename({"leader": "e-trader", "leader_price": "min price"})
+    else:
+        df_gaps = gaps.filter(pl.col("leader") == shop1).select(
+            "article",
+            "product",
+            pl.col("leader_price").alias(f"{shop1}"),
+            "shop",
+            "price",
+            "diff",
+        )
+    df_gaps_rend = df_gaps.with_columns(article_id())
 
     st.divider()
     try:
-        st.dataframe(df_unpivoted_rend, hide_index=True, use_container_width=True)
+        st.dataframe(df_gaps_rend, hide_index=True, use_container_width=True)
     except:
         st.write("No data to display")
+
+    show_timings()
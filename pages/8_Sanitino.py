@@ -2,22 +2,13 @@ import streamlit as st
 import polars as pl
 from datetime import timedelta
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from middleware import authenticate_user
-import toml
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-import io
-
-config = toml.load("./.streamlit/secrets.toml")
-key = config["secrets"]["data_key"].encode("utf-8")
-
-
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
+from charts import lollipop_traces
+from currency import RATE_HELP, fx_lookup_versioned, with_price_eur
+from data_store import load_data, load_many_versioned
+from formatting import article_id, decimal, percent
+from frame_cache import derived_frame
+from lookups import sanitino_articles
 
 # Page configuration
 st.set_page_config(
@@ -50,48 +41,30 @@ hide_st_style = """
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
 if authenticate_user():
+    from plotly.subplots import make_subplots
+
     col1, col2, col3, col4, col5, col6, col7 = st.columns([3, 1, 1, 1, 1, 1, 1])
     with col1:
         st.markdown("## Sanitino analysis")
     with col2:
-        czk = st.number_input("CZK rate:", value=25.2)
+        czk = st.number_input("CZK rate:", value=25.2, help=RATE_HELP)
     with col3:
-        ron = st.number_input("RON rate:", value=4.98)
+        ron = st.number_input("RON rate:", value=4.98, help=RATE_HELP)
     with col4:
-        plz = st.number_input("PLZ rate:", value=4.26)
+        plz = st.number_input("PLZ rate:", value=4.26, help=RATE_HELP)
     with col5:
-        huf = st.number_input("HUF rate:", value=410.0)
+        huf = st.number_input("HUF rate:", value=410.0, help=RATE_HELP)
     with col6:
-        dkk = st.number_input("DKK rate:", value=7.5)
+        dkk = st.number_input("DKK rate:", value=7.5, help=RATE_HELP)
     with col7:
-        sek = st.number_input("SEK rate:", value=10.7)
+        sek = st.number_input("SEK rate:", value=10.7, help=RATE_HELP)
+    rates = {"CZK": czk, "RON": ron, "PLN": plz, "HUF": huf, "DKK": dkk, "SEK": sek}
     st.divider()
 
-    @st.cache_data
-    def load_data(path):
-        with open(path, "rb") as f:
-            encrypted_data = f.read()
-            buffer = io.BytesIO(decrypt_data(encrypted_data, key))
-            df = pl.read_parquet(buffer)
-        return df
-
-    def calculate_price(row, czk, ron, plz):
-        if row["country"] == "cz":
-            return row["price"] / czk
-        elif row["country"] == "ro":
-            return row["price"] / ron
-        elif row["country"] == "pl":
-            return row["price"] / plz
-        elif row["country"] == "hu":
-            return row["price"] / huf
-        elif row["country"] == "dk":
-            return row["price"] / dkk
-        elif row["country"] == "se":
-            return row["price"] / sek
-        else:
-            return row["price"]
-
-    df = load_data("./data/Sen.parquet")
+    # Served without waiting for a reload; the versions key the margin cube
+    frames = load_many_versioned(["./data/Sen.parquet", "./data/an.parquet"])
+    versions = tuple(version for version, _ in frames.values())
+    df = frames["./data/Sen.parquet"][1]
     df = df.with_columns(year=pl.col("date").dt.year())
     vat = pl.DataFrame(
         {
@@ -99,22 +72,10 @@ if authenticate_user():
             "vat": [0.19, 0.21, 0.21, 0.2, 0.22, 0.23, 0.19, 0.21, 0.23, 0.27, 0.25, 0.25],
         }
     )
-    ancor = load_data("./data/an.parquet")
+    ancor = frames["./data/an.parquet"][1]
     ancor = ancor.with_columns(pl.col("article").cast(pl.Int32))
 
-    df1 = (
-        df.select("article")
-        .unique()
-        .join(
-            ancor,
-            on="article",
-            how="left",
-            # coalesce=True,
-        )
-        .select(["article", "product"])
-        .unique(["article"])
-        .sort("article")
-    )
+    df1 = sanitino_articles()
     articles = df1["article"].to_list()
     products = df1["product"].to_list()
 
@@ -145,39 +106,15 @@ if authenticate_user():
         margin_show = st.checkbox("Show margin", value=False)
 
     df_sp = (
-        df.filter(pl.col("article") == article)
+        load_data("./data/Sen.parquet", article=article)
+        .with_columns(year=pl.col("date").dt.year())
         .join(
             ancor,
             on=["article", "year"],
             how="left",
             # coalesce=True,
         )
-        .with_columns(
-            pl.when(pl.col("country") == "cz")
-            .then((pl.col("price") / czk).round(2))
-            .otherwise(
-                pl.when(pl.col("country") == "ro")
-                .then((pl.col("price") / ron).round(2))
-                .otherwise(
-                    pl.when(pl.col("country") == "pl")
-                    .then((pl.col("price") / plz).round(2))
-                    .otherwise(
-                        pl.when(pl.col("country") == "hu")
-                        .then((pl.col("price") / huf).round(2))
-                        .otherwise(
-                            pl.when(pl.col("country") == "dk")
-                            .then((pl.col("price") / dkk).round(2))
-                            .otherwise(
-                                pl.when(pl.col("country") == "se")
-                                .then((pl.col("price") / sek).round(2))
-                                .otherwise(pl.col("price"))
-                            )
-                        )
-                    )
-                )
-            )
-            .alias("price_eur")
-        )
+        .pipe(with_price_eur, "./data/Sen.parquet", rates)
     )
 
     df_sp = (
@@ -244,31 +181,16 @@ if authenticate_user():
     offset = 0.2
 
     if margin_show:
-        annotations = []
-        for i in range(len(df_latest)):
-            if df_latest["margin"][i] is not None:
-                annotations.append(
-                    dict(
-                        x=df_latest["country_id"][i],
-                        y=df_latest["margin"][i] * 100 + 8,
-                        text=f"{df_latest['margin'][i] * 100:.1f}%",
-                        showarrow=False,
-                        font=dict(size=14, color=df_latest["color"][i]),
-                    )
-                )
-                fig.add_trace(
-                    go.Scatter(
-                        x=[df_latest["country_id"][i], df_latest["country_id"][i]],
-                        y=[0, df_latest["margin"][i] * 100],
-                        mode="lines",
-                        name="",
-                        line=dict(
-                            color=df_latest["color"][i],
-                            width=3,
-                        ),
-                        showlegend=False,
-                    )
-                )
+        # Percent labels are formatted by one expression, not per row
+        df_latest = df_latest.with_columns(
+            margin_pct=pl.col("margin") * 100,
+            margin_text=percent("margin"),
+        )
+        fig.add_traces(
+            lollipop_traces(df_latest, "country_id", "margin_pct", "margin_text"),
+            rows=1,
+            cols=1,
+        )
         fig.add_trace(
             go.Scatter(
                 x=df_latest["country_id"],
@@ -279,9 +201,7 @@ if authenticate_user():
                     color=df_latest["color"],
                     size=8,
                 ),
-                text=df_latest["margin"].map_elements(
-                    lambda x: "{:.1f}%".format(x * 100), return_dtype=pl.Utf8
-                ),
+                text=df_latest["margin_text"],
                 textposition="top center",  # Position text at the top of the markers
             ),
             row=1,
@@ -305,17 +225,19 @@ if authenticate_user():
             yaxis=dict(
                 range=[0, 100], showgrid=False
             ),  # Set y-axis range from 0 to 100
-            annotations=annotations,  # Add annotations
             height=700,
         )
         fig.update_yaxes(title_text="Ancor/Sanitino Margin", row=1, col=1)
     else:
         pass
 
-    text_list = []
-    for i in range(len(df_latest)):
-        text = f'<b>{df_latest["discount"][i]/100:.0%}</b> || {df_latest["price_disc"][i]:.1f} €'
-        text_list.append(text)
+    text_list = df_latest.select(
+        pl.format(
+            "<b>{}</b> || {} €",
+            percent(pl.col("discount") / 100, 0),
+            decimal("price_disc", 1),
+        )
+    ).to_series().to_list()
 
     text_trace = go.Scatter(
         x=df_latest["country_id"],
@@ -461,62 +383,48 @@ if authenticate_user():
 
         with col22:
             vat1 = vat.filter(pl.col("country") == country1)["vat"].to_list()[0]
-            df_corr = (
-                df.filter(pl.col("country") == country1, pl.col("date") == date1)
-                .with_columns(
-                    pl.when(pl.col("country") == "cz")
-                    .then((pl.col("price") / czk).round(2))
-                    .otherwise(
-                        pl.when(pl.col("country") == "ro")
-                        .then((pl.col("price") / ron).round(2))
-                        .otherwise(
-                            pl.when(pl.col("country") == "pl")
-                            .then((pl.col("price") / plz).round(2))
-                            .otherwise(
-                                pl.when(pl.col("country") == "hu")
-                                .then((pl.col("price") / huf).round(2))
-                                .otherwise(pl.col("price"))
-                            )
-                        )
+
+            def margin_cube():
+                # Every article of the country and day, sorted by margin
+                return (
+                    df.filter(pl.col("country") == country1, pl.col("date") == date1)
+                    .pipe(with_price_eur, "./data/Sen.parquet", rates)
+                    .join(
+                        ancor.rename({"price": "ancor"}),
+                        on=["article", "year"],
+                        how="left",
+                        # coalesce=True,
                     )
-                    .alias("price_eur")
-                )
-                .join(
-                    ancor.rename({"price": "ancor"}),
-                    on=["article", "year"],
-                    how="left",
-                    # coalesce=True,
-                )
-                .with_columns(
-                    margin=(
-                        1 - pl.col("ancor") / (pl.col("price_eur") / (1 + vat1))
-                    ).round(4)
-                )
-                .unique(subset=["article", "country", "date"])
-            )
-            df_corr = (
-                df_corr.filter(pl.col("margin") < margin / 100)
-                .with_columns(
-                    pl.col("article").cast(pl.Utf8).replace(",", "").alias("article"),
-                    pl.col("price_eur").round(1).cast(pl.Utf8).replace(".", ","),
-                )
-                .sort("margin", descending=False)
-                .with_columns(
-                    pl.col("margin")
-                    .map_elements(
-                        lambda x: "{:.1f}%".format(x * 100), return_dtype=pl.Utf8
+                    .with_columns(
+                        margin=(
+                            1 - pl.col("ancor") / (pl.col("price_eur") / (1 + vat1))
+                        ).round(4)
                     )
-                    .alias("margin %")
-                )
-                .drop(
-                    "price_eur",
-                    "country",
-                    "date",
-                    "year",
-                    "ancor",
-                    "margin",
+                    .unique(subset=["article", "country", "date"])
+                    .filter(pl.col("margin").is_not_null())
+                    .sort("margin")
+                    .with_columns(
+                        article_id(),
+                        percent("margin").alias("margin %"),
+                    )
+                    .drop("price_eur", "country", "date", "year", "ancor")
                 )
+
+            cube = derived_frame(
+                "sanitino margins",
+                (
+                    country1,
+                    date1,
+                    vat1,
+                    tuple(sorted(rates.items())),
+                    versions,
+                    fx_lookup_versioned("./data/Sen.parquet")[0],
+                ),
+                margin_cube,
             )
+            # The slider only moves a binary-search cut over the sorted margins
+            cut = cube["margin"].search_sorted(margin / 100, side="left")
+            df_corr = cube.head(cut).drop("margin")
 
             title = f"Products with margin less than {margin}% in {country1} on {date1.strftime('%d.%m.%Y')} (quantity of products: {df_corr.height})"
             st.markdown(f"##### {title}")
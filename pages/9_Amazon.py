@@ -2,22 +2,13 @@ import polars as pl
 import streamlit as st
 from datetime import timedelta
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from middleware import authenticate_user
-import toml
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-import io
-
-config = toml.load("./.streamlit/secrets.toml")
-key = config["secrets"]["data_key"].encode("utf-8")
-
-
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
+from charts import lollipop_traces
+from currency import RATE_HELP, fx_lookup_versioned, with_price_eur
+from data_store import load_data, load_many_versioned
+from formatting import article_id, decimal, percent
+from frame_cache import derived_frame
+from lookups import amazon_articles
 
 # Page configuration
 st.set_page_config(
@@ -50,12 +41,6 @@ hide_st_style = """
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
 
-def decrypt_data(data, key):
-    cipher = AES.new(key, AES.MODE_CBC, iv=data[:16])
-    pt = unpad(cipher.decrypt(data[16:]), AES.block_size)
-    return pt
-
-
 # Change the font of the entire app
 def set_font(font):
     st.markdown(
@@ -81,36 +66,26 @@ hide_st_style = """
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
 if authenticate_user():
+    from plotly.subplots import make_subplots
+
     col1, col2, col3, col4 = st.columns([4, 1, 1, 1])
     with col1:
         st.markdown("## Amazon analysis")
     with col2:
-        gbp = st.number_input("GBP rate:", value=0.855)
+        gbp = st.number_input("GBP rate:", value=0.855, help=RATE_HELP)
     with col3:
-        sek = st.number_input("SEK rate:", value=11.6)
+        sek = st.number_input("SEK rate:", value=11.6, help=RATE_HELP)
     with col4:
-        plz = st.number_input("PLZ rate:", value=4.29)
+        plz = st.number_input("PLZ rate:", value=4.29, help=RATE_HELP)
+    rates = {"GBP": gbp, "SEK": sek, "PLN": plz}
     st.divider()
 
-    @st.cache_data
-    def load_data(path):
-        with open(path, "rb") as f:
-            encrypted_data = f.read()
-            buffer = io.BytesIO(decrypt_data(encrypted_data, key))
-            df = pl.read_parquet(buffer)
-        return df
-
-    def calculate_price(row, gbp, plz):
-        if row["country"] == "uk":
-            return row["price"] / gbp
-        elif row["country"] == "se":
-            return row["price"] / sek
-        elif row["country"] == "pl":
-            return row["price"] / plz
-        else:
-            return row["price"]
-
-    df = load_data("./data/Aen.parquet")
+    # Served without waiting for a reload; the versions key the margin cube
+    frames = load_many_versioned(
+        ["./data/Aen.parquet", "./data/tlp.parquet", "./data/Amz.parquet"]
+    )
+    versions = tuple(version for version, _ in frames.values())
+    df = frames["./data/Aen.parquet"][1]
     df = df.with_columns(pl.col("date").cast(pl.Date), year=pl.col("date").dt.year())
     vat = pl.DataFrame(
         {
@@ -118,24 +93,11 @@ if authenticate_user():
             "vat": [0.19, 0.2, 0.2, 0.22, 0.25, 0.21, 0.23],
         }
     )
-    hnp = load_data("./data/tlp.parquet")
+    hnp = frames["./data/tlp.parquet"][1]
     hnp = hnp.with_columns(pl.col("article").cast(pl.Int32))
-    amz = load_data("./data/Amz.parquet")
+    amz = frames["./data/Amz.parquet"][1]
 
-    df1 = (
-        df.select("article")
-        .unique()
-        .join(
-            hnp.select(["article", "product"]),
-            on="article",
-            how="left",
-            # coalesce=True,
-        )
-        .select(["article", "product"])
-        .unique("article")
-        .unique(["article"])
-        .sort("article")
-    )
+    df1 = amazon_articles()
     articles = df1["article"].to_list()
     products = df1["product"].to_list()
 
@@ -165,27 +127,17 @@ if authenticate_user():
         margin_show = st.checkbox("Show margin", value=False)
 
     df_sp = (
-        df.filter(pl.col("article") == article)
+        load_data("./data/Aen.parquet", article=article)
+        .with_columns(
+            pl.col("date").cast(pl.Date), year=pl.col("date").dt.year()
+        )
         .join(
             hnp.select(["article", "product", "year", "price"]),
             on=["article", "year"],
             how="left",
             # coalesce=True,
         )
-        .with_columns(
-            pl.when(pl.col("country") == "uk")
-            .then((pl.col("price") / gbp).round(2))
-            .otherwise(
-                pl.when(pl.col("country") == "se")
-                .then((pl.col("price") / sek).round(2))
-                .otherwise(
-                    pl.when(pl.col("country") == "pl")
-                    .then((pl.col("price") / plz).round(2))
-                    .otherwise(pl.col("price")),
-                )
-            )
-            .alias("price_eur")
-        )
+        .pipe(with_price_eur, "./data/Aen.parquet", rates)
     )
     df_sp = (
         df_sp.join(
@@ -231,30 +183,16 @@ if authenticate_user():
     )
 
     if margin_show:
-        annotations = []
-        for i in range(len(df_latest)):
-            annotations.append(
-                dict(
-                    x=df_latest["country"][i],
-                    y=df_latest["margin"][i] * 100 + 8,
-                    text=f"{df_latest['margin'][i] * 100:.1f}%",
-                    showarrow=False,
-                    font=dict(size=14, color=df_latest["color"][i]),
-                )
-            )
-            fig.add_trace(
-                go.Scatter(
-                    x=[df_latest["country"][i], df_latest["country"][i]],
-                    y=[0, df_latest["margin"][i] * 100],
-                    mode="lines",
-                    name="",
-                    line=dict(
-                        color=df_latest["color"][i],
-                        width=3,
-                    ),
-                    showlegend=False,
-                )
-            )
+        # Percent labels are formatted by one expression, not per row
+        df_latest = df_latest.with_columns(
+            margin_pct=pl.col("margin") * 100,
+            margin_text=percent("margin"),
+        )
+        fig.add_traces(
+            lollipop_traces(df_latest, "country", "margin_pct", "margin_text"),
+            rows=1,
+            cols=1,
+        )
         fig.add_trace(
             go.Scatter(
                 x=df_latest["country"],
@@ -265,9 +203,7 @@ if authenticate_user():
                     color=df_latest["color"],
                     size=8,
                 ),
-                text=df_latest["margin"].map_elements(
-                    lambda x: "{:.1f}%".format(x * 100), return_dtype=pl.Utf8
-                ),
+                text=df_latest["margin_text"],
                 textposition="top center",  # Position text at the top of the markers
             ),
             row=1,
@@ -291,7 +227,6 @@ if authenticate_user():
             yaxis=dict(
                 range=[-20, 80], showgrid=False
             ),  # Set y-axis range from 0 to 100
-            annotations=annotations,  # Add annotations
             height=700,
         )
         fig.update_yaxes(title_text="Amazon Margin", row=1, col=1)
@@ -342,64 +277,54 @@ if authenticate_user():
             )
         with col22:
             vat1 = vat.filter(pl.col("country") == country1)["vat"].to_list()[0]
-            df_corr = (
-                df.filter(pl.col("country") == country1, pl.col("date") == date1)
-                .join(
-                    hnp.select(["article", "product", "year"]),
-                    on=["article", "year"],
-                    how="left",
-                    # coalesce=True,
-                )
-                .with_columns(
-                    pl.when(pl.col("country") == "uk")
-                    .then((pl.col("price") / gbp).round(2))
-                    .otherwise(
-                        pl.when(pl.col("country") == "se")
-                        .then((pl.col("price") / sek).round(2))
-                        .otherwise(
-                            pl.when(pl.col("country") == "pl")
-                            .then((pl.col("price") / plz).round(2))
-                            .otherwise(pl.col("price"))
-                        )
+
+            def margin_cube():
+                # Every article of the country and day, sorted by margin
+                return (
+                    df.filter(pl.col("country") == country1, pl.col("date") == date1)
+                    .join(
+                        hnp.select(["article", "product", "year"]),
+                        on=["article", "year"],
+                        how="left",
+                        # coalesce=True,
                     )
-                    .alias("price_eur")
-                )
-                .join(
-                    amz.rename({"amz_price": "amazon"}),
-                    on="article",
-                    how="left",
-                    # coalesce=True,
-                )
-                .with_columns(
-                    margin=(
-                        1 - pl.col("amazon") / (pl.col("price_eur") / (1 + vat1))
-                    ).round(4)
-                )
-            )
-            df_corr = (
-                df_corr.filter(pl.col("margin") < margin / 100)
-                .with_columns(
-                    pl.col("article").cast(pl.Utf8).replace(",", "").alias("article"),
-                    pl.col("price_eur").round(1).cast(pl.Utf8).replace(".", ","),
-                )
-                .sort("margin", descending=False)
-                .with_columns(
-                    pl.col("margin")
-                    .map_elements(
-                        lambda x: "{:.1f}%".format(x * 100), return_dtype=pl.Utf8
+                    .pipe(with_price_eur, "./data/Aen.parquet", rates)
+                    .join(
+                        amz.rename({"amz_price": "amazon"}),
+                        on="article",
+                        how="left",
+                        # coalesce=True,
                     )
-                    .alias("margin %")
-                )
-                .drop(
-                    "year",
-                    "country",
-                    "date",
-                    "hnp",
-                    "subcategory",
-                    "family",
-                    "margin",
+                    .with_columns(
+                        margin=(
+                            1 - pl.col("amazon") / (pl.col("price_eur") / (1 + vat1))
+                        ).round(4)
+                    )
+                    .filter(pl.col("margin").is_not_null())
+                    .sort("margin")
+                    .with_columns(
+                        article_id(),
+                        decimal("price_eur", 1),
+                        percent("margin").alias("margin %"),
+                    )
+                    .drop("year", "country", "date", "hnp", "subcategory", "family")
                 )
+
+            cube = derived_frame(
+                "amazon margins",
+                (
+                    country1,
+                    date1,
+                    vat1,
+                    tuple(sorted(rates.items())),
+                    versions,
+                    fx_lookup_versioned("./data/Aen.parquet")[0],
+                ),
+                margin_cube,
             )
+            # The slider only moves a binary-search cut over the sorted margins
+            cut = cube["margin"].search_sorted(margin / 100, side="left")
+            df_corr = cube.head(cut).drop("margin")
 
             title = f"Products with margin less than {margin}% in {country1} on {date1.strftime('%d.%m.%Y')} (quantity of products: {df_corr.height})"
             st.markdown(f"##### {title}")
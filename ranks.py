@@ -0,0 +1,189 @@
+"""Price rank of every shop per (country, date, article).
+
+Rank 1 is the cheapest offer of an article on a day; ties share the lower
+rank ("min"). Ranks are kept for both price columns, as UInt16 next to a
+Categorical shop column. The table is materialised at ingest (`python
+ingest.py ranks`) and extended by `ingest.py append`; until then it is
+computed from the price history. Either way it is built once per version
+of its source and shared by every session, so the shop pages read the
+ranks of a day instead of running the rank window on every rerun.
+
+Per-day counts of each shop's ranks are kept next to the table; both grow
+by the new days only when days are appended. Days the price history has
+past the materialised table are ranked from the prices on the fly.
+"""
+import os
+from datetime import timedelta
+
+import polars as pl
+
+from aggregates import PRICE_COLUMNS
+from data_store import (
+    PRICES_PATH,
+    RANKS_PATH,
+    load_versioned,
+    partition_months,
+    scan_prices_versioned,
+)
+
+_tables = {}  # country -> (version read, rank table, rank counts)
+_recent = {}  # country -> ((table version, prices version), table, counts)
+
+
+def rank_column(column):
+    return f"rank_{column}"
+
+
+def build_rank_table(df):
+    """Rank a price history frame (country, date, shop, article, price,
+    price_delivery); a shop listed twice for an article counts once, at its
+    lower price."""
+    return (
+        df.lazy()
+        .with_columns(pl.col("date").cast(pl.Date))
+        .group_by("country", "date", "article", "shop")
+        .agg(pl.col(column).min() for column in PRICE_COLUMNS)
+        .select(
+            "country",
+            "date",
+            "article",
+            pl.col("shop").cast(pl.Categorical),
+            *(
+                pl.col(column)
+                .rank("min")
+                .over("country", "date", "article")
+                .cast(pl.UInt16)
+                .alias(rank_column(column))
+                for column in PRICE_COLUMNS
+            ),
+        )
+        .sort("country", "article", "date")
+        .collect()
+    )
+
+
+def _source(country):
+    # (version, frame) of what the ranks come from, tagged with the kind of
+    # source; served without waiting for a reload in progress
+    if os.path.exists(RANKS_PATH):
+        version, frame = load_versioned(RANKS_PATH, country=country)
+        return ("ranks", version), frame
+    if partition_months(country):
+        version, frame = scan_prices_versioned(country)
+        return ("partitions", version), frame
+    version, frame = load_versioned(PRICES_PATH, country=country)
+    return ("prices", version), frame
+
+
+def _appended(old, new):
+    # Only days were added: more partition files, or more segments on the
+    # same base file (compact rewrites the base)
+    if old[0] != new[0]:
+        return False
+    if old[0] == "partitions":
+        return set(old[1]) <= set(new[1])
+    return old[1][0] == new[1][0]
+
+
+def _count_ranks(ranks):
+    return {
+        column: ranks.group_by("date", "shop", rank=rank_column(column))
+        .len("count")
+        .sort("date")
+        for column in PRICE_COLUMNS
+    }
+
+
+def _ranks(country):
+    """(version, rank table sorted by date, {column: per-day rank counts}).
+
+    The cache is keyed on the version of the source frame it was built
+    from. When days were only appended to the source, just the days after
+    the last cached one are ranked and counted and added to the cached
+    frames (days arrive in date order, as with `ingest.py append`); any
+    other change rebuilds both. A materialised table is extended by the
+    price days past its end, cached under both versions.
+    """
+    version, source = _source(country)
+    cached = _tables.get(country)
+    materialised = version[0] == "ranks"
+    if cached is None or cached[0] != version:
+        cached = _rebuild(cached, version, source, materialised)
+        _tables[country] = cached
+    return _with_recent_days(country, cached) if materialised else cached
+
+
+def _rebuild(cached, version, source, materialised):
+    if cached is not None and cached[1].height and _appended(cached[0], version):
+        new = source.filter(pl.col("date").cast(pl.Date) > cached[1]["date"].max())
+        new = (new if materialised else build_rank_table(new)).sort("date")
+        return _extended(version, cached, new)
+    table = (source if materialised else build_rank_table(source)).sort("date")
+    return (version, table, _count_ranks(table))
+
+
+def _extended(version, cached, new):
+    # `cached` with the ranks of later days added, under `version`
+    table = pl.concat([cached[1], new], how="vertical_relaxed")
+    counts = {
+        column: pl.concat([cached[2][column], new_counts], how="vertical_relaxed")
+        for column, new_counts in _count_ranks(new).items()
+    }
+    return (version, table, counts)
+
+
+def _with_recent_days(country, cached):
+    # Days the price history has past the materialised table (rewritten or
+    # re-partitioned without `ingest.py ranks`) are ranked on the fly
+    if not partition_months(country) and not os.path.exists(PRICES_PATH):
+        return cached
+    last = cached[1]["date"].max()
+    date_range = None if last is None else (last + timedelta(days=1), None)
+    prices_version, prices = scan_prices_versioned(country, date_range=date_range)
+    if prices.is_empty():
+        return cached
+    key = (cached[0], prices_version)
+    recent = _recent.get(country)
+    if recent is None or recent[0] != key:
+        recent = _extended(key, cached, build_rank_table(prices).sort("date"))
+        _recent[country] = recent
+    return recent
+
+
+def rank_table(country):
+    return _ranks(country)[1]
+
+
+def day_ranks(country, day, column="price"):
+    """(article, shop, rank) of every offer on `day`, ranked by `column`.
+
+    The table is sorted by date, so the day is a binary-searched slice.
+    """
+    ranks = rank_table(country)
+    start = ranks["date"].search_sorted(day, side="left")
+    stop = ranks["date"].search_sorted(day, side="right")
+    return ranks.slice(start, stop - start).select(
+        "article", pl.col("shop").cast(pl.Utf8), rank=rank_column(column)
+    )
+
+
+def rank_history(country, shops, column="price", ranks=(1, 2)):
+    """Daily number of articles at each of `ranks` for every shop in `shops`.
+
+    Read from the per-day counts kept next to the rank table, so it does
+    not rerun the rank window over the history. Days without such an
+    article count 0. Rows run by shop, rank, then date.
+    """
+    counts = _ranks(country)[2][column]
+    days = counts.select(pl.col("date").unique().sort())
+    grid = (
+        pl.DataFrame({"shop": list(dict.fromkeys(shops))})
+        .join(pl.DataFrame({"rank": ranks}, schema={"rank": pl.UInt16}), how="cross")
+        .join(days, how="cross")
+    )
+    return grid.join(
+        counts.with_columns(pl.col("shop").cast(pl.Utf8)),
+        on=["shop", "rank", "date"],
+        how="left",
+        maintain_order="left",
+    ).with_columns(pl.col("count").fill_null(0))
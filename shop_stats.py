@@ -0,0 +1,70 @@
+"""Per-shop summaries for the shop analysis pages."""
+import polars as pl
+
+
+def price_change_counts(df, shops, column, last_day, previous):
+    """Count products whose price rose or fell since each earlier date.
+
+    `previous` maps a period name ("day", "week", "month") to its date.
+    Returns {shop: {"day_up": n, "day_down": n, ...}}; a product counts
+    for a period when it has a price on both that date and `last_day`
+    (first row per product and date). Everything is computed in one
+    group_by over the selected shops and dates, without pivoting.
+    """
+    dates = {"last": last_day, **previous}
+    per_product = (
+        df.filter(
+            pl.col("shop").is_in(shops), pl.col("date").is_in(list(dates.values()))
+        )
+        .group_by("shop", "product")
+        .agg(
+            pl.col(column).filter(pl.col("date") == day).first().alias(name)
+            for name, day in dates.items()
+        )
+    )
+    counts = per_product.group_by("shop").agg(
+        *(
+            expr
+            for name in previous
+            for expr in (
+                (pl.col("last") > pl.col(name)).sum().alias(f"{name}_up"),
+                (pl.col("last") < pl.col(name)).sum().alias(f"{name}_down"),
+            )
+        )
+    )
+    empty = {f"{name}_{way}": 0 for name in previous for way in ("up", "down")}
+    result = {shop: dict(empty) for shop in shops}
+    for row in counts.iter_rows(named=True):
+        result[row.pop("shop")].update(row)
+    return result
+
+
+def price_gaps(df, column, max_rank=2, min_diff=0.0):
+    """Competitor offers above the cheapest one, for every shop at rank 1.
+
+    `df` (a DataFrame or LazyFrame) has article, product, shop, `column` and
+    that column's "rank". Each rank-1 shop of an article ("leader") gets one
+    row per other offer ranked up to `max_rank`, with its `diff` to the
+    leader's price; articles where no offer is `min_diff` dearer are left
+    out. Rows are ordered by the article's largest gap (prmax), then diff.
+    All leaders come from one pass over the long table, without pivoting.
+    """
+    rank_one = pl.col("rank") == 1
+    return (
+        df.filter(pl.col("rank") <= max_rank, pl.col(column).is_not_null())
+        .select("article", "product", "shop", "rank", price=pl.col(column))
+        .with_columns(
+            leader=pl.col("shop").filter(rank_one).over(
+                "article", mapping_strategy="join"
+            ),
+            leader_price=pl.col("price").filter(rank_one).min().over("article"),
+        )
+        .with_columns(diff=pl.col("price") - pl.col("leader_price"))
+        .filter(pl.col("diff").max().over("article") >= min_diff)
+        .with_columns(prmax=pl.col("diff").max().over("article"))
+        .explode("leader")
+        .filter(pl.col("shop") != pl.col("leader"))
+        .sort(["prmax", "diff"], descending=[True, False], maintain_order=True)
+        .unique(["leader", "article", "shop"], keep="first", maintain_order=True)
+        .select("leader", "article", "product", "leader_price", "shop", "price", "diff")
+    )
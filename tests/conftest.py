@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import polars as pl
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import data_store  # noqa: E402
+import ranks  # noqa: E402
+
+
+def make_prices(days=40, articles=30, shops=5, countries=("de", "fr"), start=None):
+    """Price history with gaps and ties, in the layout of ./data/Ien.parquet."""
+    rng = np.random.default_rng(7)
+    start = start or date(2025, 1, 1)
+    rows = [
+        (start + timedelta(days=d), country, f"shop{s}.{country}", 10_000 + a)
+        for d in range(days)
+        for country in countries
+        for s in range(shops)
+        for a in range(articles)
+    ]
+    df = pl.DataFrame(
+        rows, schema=["date", "country", "shop", "article"], orient="row"
+    ).with_columns(pl.col("article").cast(pl.Int32))
+    price = rng.integers(50, 80, df.height).astype(np.float64)
+    return (
+        df.with_columns(price=price, price_delivery=price + rng.integers(0, 6, df.height))
+        .filter(pl.Series(rng.random(df.height) < 0.8))
+    )
+
+
+def wait_for_reloads(timeout=10):
+    # Background reloads scheduled by load_data while serving a stale frame
+    deadline = time.monotonic() + timeout
+    while data_store._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Relative ./data paths point into tmp_path; caches start empty
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(data_store, "_key", b"k" * 32)
+    monkeypatch.setattr(data_store, "_frames", {})
+    monkeypatch.setattr(data_store, "_selections", OrderedDict())
+    monkeypatch.setattr(ranks, "_tables", {})
+    monkeypatch.setattr(ranks, "_recent", {})
+    return tmp_path
@@ -0,0 +1,44 @@
+from datetime import date
+
+import polars as pl
+
+import ingest
+from aggregates import build_daily_aggregates, load_daily_aggregates
+from conftest import make_prices
+from ingest import write_segmented
+
+PATH = "./data/Ien.parquet"
+
+
+def _expected(df, *predicates):
+    return build_daily_aggregates(df.filter(pl.col("country") == "de", *predicates))
+
+
+def _sorted(df):
+    # Shops tied on price come in any order, so only the numbers are compared
+    return df.select(pl.exclude("^.*_shop$", "^top3_.*$")).sort("article", "date")
+
+
+def test_aggregates_cover_days_past_the_materialised_table(workdir):
+    df = make_prices(days=12)
+    last_day = date(2025, 1, 12)
+    write_segmented(df.filter(pl.col("date") < last_day), PATH)
+    ingest.aggregates(PATH, "./data/Ien_daily.parquet")
+    # The history is rewritten with one more day, the aggregates are not
+    write_segmented(df, PATH)
+    ingest.partition(PATH, "./data/Ien")
+
+    recent = load_daily_aggregates("de", date_range=(date(2025, 1, 10), None))
+    expected = _expected(df, pl.col("date") >= date(2025, 1, 10))
+    assert _sorted(recent).equals(_sorted(expected))
+    history = load_daily_aggregates("de", article=10_004)
+    expected = _expected(df, pl.col("article") == 10_004)
+    assert _sorted(history).equals(_sorted(expected))
+    assert load_daily_aggregates("de", date_range=(None, date(2025, 1, 5))).height
+
+
+def test_materialised_aggregates_match_the_prices(workdir):
+    df = make_prices(days=12)
+    write_segmented(df, PATH)
+    ingest.aggregates(PATH, "./data/Ien_daily.parquet")
+    assert _sorted(load_daily_aggregates("de")).equals(_sorted(_expected(df)))
@@ -0,0 +1,77 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+import data_store
+from conftest import make_prices
+from data_store import load_data, read_encrypted, read_manifest
+from ingest import append_day, compact, write_segmented
+
+PATH = "./data/Ien.parquet"
+
+
+def _sorted(df):
+    return df.sort("country", "article", "date", "shop")
+
+
+def _write_day(df, day, name):
+    df.filter(pl.col("date") == day).write_parquet(name)
+    return name
+
+
+def test_append_and_compact(workdir):
+    df = make_prices(days=12)
+    history = df.filter(pl.col("date") < date(2025, 1, 11))
+    write_segmented(history, PATH)
+    version = data_store.dataset_version(PATH)
+    load_data(PATH)
+
+    for day in (date(2025, 1, 11), date(2025, 1, 12)):
+        append_day(_write_day(df, day, f"{day}.parquet"), PATH)
+    assert read_manifest(PATH) == ("2025-01-11.parquet", "2025-01-12.parquet")
+    assert data_store.dataset_version(PATH)[0] == version[0]
+    assert _sorted(load_data(PATH, consistent=True)).equals(_sorted(df))
+    last_day = load_data(
+        PATH, country="de", date_range=(date(2025, 1, 12), None), consistent=True
+    )
+    assert _sorted(last_day).equals(
+        _sorted(df.filter(pl.col("country") == "de", pl.col("date") == date(2025, 1, 12)))
+    )
+
+    compact(PATH)
+    assert read_manifest(PATH) == ()
+    assert list((workdir / "data" / "Ien.segments").iterdir()) == [
+        workdir / "data" / "Ien.segments" / "manifest.json"
+    ]
+    assert _sorted(read_encrypted(PATH)).equals(_sorted(df))
+    assert _sorted(load_data(PATH, consistent=True)).equals(_sorted(df))
+
+
+@pytest.mark.parametrize("compacted", [False, True])
+def test_append_rejects_days_already_present(workdir, compacted):
+    df = make_prices(days=12)
+    write_segmented(df.filter(pl.col("date") < date(2025, 1, 12)), PATH)
+    append_day(_write_day(df, date(2025, 1, 12), "new.parquet"), PATH)
+    if compacted:
+        compact(PATH)
+    for day in (date(2025, 1, 12), date(2025, 1, 3)):
+        with pytest.raises(ValueError, match="not after"):
+            append_day(_write_day(df, day, "again.parquet"), PATH)
+    assert _sorted(load_data(PATH, consistent=True)).equals(_sorted(df))
+
+
+def test_append_checks_the_last_day_from_the_index_only(workdir, monkeypatch):
+    df = make_prices(days=12)
+    history = df.filter(pl.col("date") < date(2025, 1, 11))
+    write_segmented(history, PATH, row_group_rows=500)
+    append_day(_write_day(df, date(2025, 1, 11), "first.parquet"), PATH)
+    assert data_store.last_date(PATH) == date(2025, 1, 11)
+
+    decoded = []
+    monkeypatch.setattr(data_store, "_decode_parquet", lambda *args: decoded.append(1))
+    append_day(_write_day(df, date(2025, 1, 12), "second.parquet"), PATH)
+    with pytest.raises(ValueError, match="not after"):
+        append_day(_write_day(df, date(2025, 1, 12), "again.parquet"), PATH)
+    assert decoded == []
+    assert data_store.last_date(PATH) == date(2025, 1, 12)
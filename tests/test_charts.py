@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from charts import downsample_index
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("size", [5, 6, 50, 1001])
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 10])
+def test_downsample_index_at_most_n_points(method, size, n):
+    rng = np.random.default_rng(size)
+    y = rng.normal(size=size).cumsum()
+    index = downsample_index(np.arange(size), y, n, method)
+    assert len(index) <= n
+    assert np.all(np.diff(index) > 0)
+    assert index[-1] == size - 1
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_index_keeps_first_and_last(method):
+    y = np.sin(np.linspace(0, 20, 500))
+    index = downsample_index(np.arange(500), y, 40, method)
+    assert index[0] == 0 and index[-1] == 499
@@ -0,0 +1,91 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+import currency
+from data_store import FX_PATH, read_encrypted
+from ingest import import_fx, write_segmented
+
+PATH = "./data/Sen.parquet"
+PAGE_RATES = {"CZK": 20.0}
+
+ECB_CSV = """Date,USD,CZK,GBP,
+2025-01-06,1.03,25.40,N/A,
+2025-01-03,1.03,25.20,0.83,
+2025-01-02,1.04,25.00,0.83,
+"""
+
+
+@pytest.fixture
+def rates(workdir, monkeypatch):
+    monkeypatch.setattr(currency, "_lookups", {})
+    with open("eurofxref-hist.csv", "w") as f:
+        f.write(ECB_CSV)
+    import_fx("eurofxref-hist.csv")
+
+
+def _prices_eur(rows):
+    df = pl.DataFrame(
+        rows, schema=["country", "date", "price"], orient="row"
+    ).with_columns(pl.col("price").cast(pl.Float64))
+    write_segmented(df, PATH)
+    return currency.with_price_eur(df, PATH, PAGE_RATES)["price_eur"].to_list()
+
+
+def test_import_fx_merges_the_ecb_history(workdir):
+    write_segmented(
+        pl.DataFrame(
+            {
+                "date": [date(2024, 12, 31), date(2025, 1, 2)],
+                "currency": ["CZK", "CZK"],
+                "rate": [25.1, 99.0],
+            }
+        ),
+        FX_PATH,
+    )
+    with open("eurofxref-hist.csv", "w") as f:
+        f.write(ECB_CSV)
+    import_fx("eurofxref-hist.csv")
+
+    fx = read_encrypted(FX_PATH).sort("currency", "date")
+    czk = fx.filter(pl.col("currency") == "CZK")
+    # Kept where the CSV has no rate, replaced where it has one
+    assert czk["date"].to_list() == [
+        date(2024, 12, 31), date(2025, 1, 2), date(2025, 1, 3), date(2025, 1, 6)
+    ]
+    assert czk["rate"].to_list() == [25.1, 25.0, 25.2, 25.4]
+    # N/A and the empty column after the trailing comma are dropped
+    assert sorted(fx["currency"].unique()) == ["CZK", "GBP", "USD"]
+    assert fx.filter(pl.col("currency") == "GBP").height == 2
+
+
+def test_weekend_days_take_the_previous_rate(rates):
+    assert _prices_eur(
+        [
+            ("cz", date(2025, 1, 3), 252.0),
+            ("cz", date(2025, 1, 4), 252.0),  # Saturday: Friday's 25.2
+            ("cz", date(2025, 1, 5), 504.0),
+            ("cz", date(2025, 1, 6), 254.0),
+        ]
+    ) == [10.0, 10.0, 20.0, 10.0]
+
+
+def test_days_past_the_tolerance_fall_back_to_the_page_rate(rates):
+    assert _prices_eur(
+        [
+            ("cz", date(2025, 1, 13), 254.0),  # seven days after the last rate
+            ("cz", date(2025, 1, 14), 254.0),
+            ("cz", date(2024, 12, 31), 200.0),  # before the first rate
+        ]
+    ) == [10.0, 12.7, 10.0]
+
+
+def test_eur_countries_keep_their_price(rates):
+    assert _prices_eur(
+        [
+            ("de", date(2025, 1, 3), 12.34),
+            ("fr", date(2025, 1, 20), 56.78),
+            ("cz", date(2025, 1, 3), 252.0),
+        ]
+    ) == [12.34, 56.78, 10.0]
@@ -0,0 +1,35 @@
+import math
+
+import polars as pl
+import pytest
+
+from formatting import decimal, percent
+
+VALUES = [
+    0.0, 1.0, 12.5, 1234.5678,
+    2.675, 0.125, 1.005, 0.5, 1.5, 2.5,  # ties, exact and in binary
+    -1.005, -2.675, -0.004, -0.5, -12.345,
+]
+
+
+def _python(value, decimals, suffix=""):
+    return f"{value:.{decimals}f}".replace(".", ",") + suffix
+
+
+@pytest.mark.parametrize("decimals", [0, 1, 2])
+def test_decimal_matches_python_format(decimals):
+    result = pl.DataFrame({"x": VALUES}).select(decimal("x", decimals))["x"].to_list()
+    assert result == [_python(value, decimals) for value in VALUES]
+
+
+@pytest.mark.parametrize("decimals", [0, 1, 2])
+def test_percent_matches_python_format(decimals):
+    result = pl.DataFrame({"x": VALUES}).select(percent("x", decimals))["x"].to_list()
+    assert result == [_python(value * 100, decimals, "%") for value in VALUES]
+
+
+@pytest.mark.parametrize("format", [decimal, percent])
+def test_missing_and_non_finite_values_are_empty(format):
+    df = pl.DataFrame({"x": [None, math.nan, math.inf, -math.inf, 1.0]})
+    result = df.select(format("x"))["x"].to_list()
+    assert result[:4] == ["", "", "", ""] and result[4] != ""
@@ -0,0 +1,25 @@
+from datetime import date
+
+import polars as pl
+
+from conftest import make_prices, wait_for_reloads
+import lookups
+from ingest import append_day, write_segmented
+
+PATH = "./data/Ien.parquet"
+
+
+def test_price_shops_cover_the_whole_history(workdir, monkeypatch):
+    monkeypatch.setattr(lookups, "_tables", {})
+    df = make_prices(days=12, shops=3)
+    day = date(2025, 1, 12)
+    history = df.filter(pl.col("date") < day, pl.col("shop") != "shop2.de")
+    write_segmented(history, PATH)
+    assert lookups.price_shops("de") == ["shop0.de", "shop1.de"]
+
+    # A shop first seen on the new day joins the list once it is served
+    df.filter(pl.col("date") == day).write_parquet("day.parquet")
+    append_day("day.parquet", PATH)
+    lookups.price_shops("de")
+    wait_for_reloads()
+    assert lookups.price_shops("de") == ["shop0.de", "shop1.de", "shop2.de"]
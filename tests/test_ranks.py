@@ -0,0 +1,69 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+from conftest import make_prices, wait_for_reloads
+import ingest
+from data_store import latest_date
+from ingest import append_day, compact, write_segmented
+from ranks import day_ranks
+
+PATH = "./data/Ien.parquet"
+
+
+def _old_day_ranks(df, day, column):
+    # The rank window the shop pages ran on every rerun
+    return (
+        df.filter(pl.col("country") == "de", pl.col("date") == day)
+        .select(
+            "article",
+            "shop",
+            rank=pl.col(column).rank("min").over("article").cast(pl.UInt16),
+        )
+        .sort("article", "shop")
+    )
+
+
+@pytest.mark.parametrize("column", ["price", "price_delivery"])
+def test_day_ranks_matches_rank_window(workdir, column):
+    df = make_prices()
+    write_segmented(df, PATH)
+    for day in (date(2025, 1, 1), date(2025, 2, 9)):
+        expected = _old_day_ranks(df, day, column)
+        assert day_ranks("de", day, column).sort("article", "shop").equals(expected)
+
+
+def test_day_ranks_follow_append_and_compact(workdir):
+    df = make_prices(days=12)
+    last_day = date(2025, 1, 12)
+    write_segmented(df.filter(pl.col("date") < last_day), PATH)
+    assert day_ranks("de", last_day).height == 0
+
+    df.filter(pl.col("date") == last_day).write_parquet("day.parquet")
+    append_day("day.parquet", PATH)
+    # The cached ranks are served while the new day loads in the background
+    assert day_ranks("de", last_day).height == 0
+    wait_for_reloads()
+    expected = _old_day_ranks(df, last_day, "price")
+    assert day_ranks("de", last_day).sort("article", "shop").equals(expected)
+    compact(PATH)
+    day_ranks("de", last_day)
+    wait_for_reloads()
+    assert day_ranks("de", last_day).sort("article", "shop").equals(expected)
+
+
+def test_day_ranks_cover_days_past_the_materialised_table(workdir):
+    df = make_prices(days=12)
+    last_day = date(2025, 1, 12)
+    write_segmented(df.filter(pl.col("date") < last_day), PATH)
+    ingest.ranks(PATH, "./data/Ien_ranks.parquet")
+    # The history is rewritten with one more day, the ranks are not
+    write_segmented(df, PATH)
+    ingest.partition(PATH, "./data/Ien")
+
+    assert latest_date("de") == last_day
+    expected = _old_day_ranks(df, last_day, "price")
+    assert day_ranks("de", last_day).sort("article", "shop").equals(expected)
+    earlier = _old_day_ranks(df, date(2025, 1, 3), "price")
+    assert day_ranks("de", date(2025, 1, 3)).sort("article", "shop").equals(earlier)
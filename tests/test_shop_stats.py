@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+import polars as pl
+import pytest
+
+from conftest import make_prices
+from shop_stats import price_change_counts, price_gaps
+
+LAST_DAY = date(2025, 2, 9)
+PREVIOUS = {
+    "day": LAST_DAY - timedelta(days=1),
+    "week": LAST_DAY - timedelta(weeks=1),
+    "month": LAST_DAY - timedelta(days=30),
+}
+
+
+def _prices():
+    return make_prices().filter(pl.col("country") == "de").with_columns(
+        product=pl.format("p{}", "article")
+    )
+
+
+def _old_price_changes(df, shop, column):
+    # The shop page's per-shop pivot, before price_change_counts
+    pivot_df = (
+        df.filter(pl.col("shop") == shop)
+        .sort("date")
+        .with_columns(pl.col("date").cast(pl.Utf8))
+        .pivot(values=column, index="product", on="date", aggregate_function="first")
+    )
+    last = pivot_df.columns[-1]
+    counts = {}
+    for name, position in (("day", -2), ("week", -3), ("month", -4)):
+        change = pl.col(pivot_df.columns[position]) - pl.col(last)
+        counts[name] = (
+            pivot_df.filter(change > 0).height,
+            pivot_df.filter(change < 0).height,
+        )
+    return counts
+
+
+@pytest.mark.parametrize("column", ["price", "price_delivery"])
+def test_price_change_counts_matches_pivot(column):
+    df = _prices().filter(pl.col("date").is_in([LAST_DAY, *PREVIOUS.values()]))
+    shops = ["shop0.de", "shop3.de", "missing.de"]
+    counts = price_change_counts(df, shops, column, LAST_DAY, PREVIOUS)
+    for shop in shops[:2]:
+        for name, (old_up, old_down) in _old_price_changes(df, shop, column).items():
+            # The old tiles counted previous - last > 0, i.e. drops, as increases
+            assert counts[shop][f"{name}_up"] == old_down
+            assert counts[shop][f"{name}_down"] == old_up
+    assert set(counts["missing.de"].values()) == {0}
+
+
+def _old_price_gaps(df, shop1, rank, min_diff, column):
+    # The shop page's per-leader pivot/unpivot, before price_gaps
+    articles = df.filter(pl.col("shop") == shop1, pl.col("rank") == 1)["article"]
+    offers = (
+        df.filter(pl.col("article").is_in(articles.implode()), pl.col("rank") <= rank)
+        .select("article", "shop", "product", column)
+        .sort(by=["article", "shop"], descending=[True, False], nulls_last=True)
+    )
+    pivot = offers.pivot(
+        values=column, index=["article", "product"], on="shop", aggregate_function="first"
+    )
+    shops = [c for c in pivot.columns if c not in ("article", "product", shop1)]
+    if shop1 not in pivot.columns:
+        return pivot.head(0)
+    pivot = pivot.select("article", "product", shop1, *shops)
+    gaps = (
+        pivot.unpivot(
+            index=["article", "product", shop1], value_name="price", variable_name="shop"
+        )
+        .filter(pl.col("price").is_not_null())
+        .with_columns(diff=pl.col("price") - pl.col(shop1))
+    )
+    kept = gaps.with_columns(prmax=pl.col("diff").max().over("article")).filter(
+        pl.col("diff") >= min_diff
+    )
+    return (
+        gaps.join(kept, "article", how="left")
+        .filter(pl.col("prmax").is_not_null())
+        .sort(["prmax", "diff"], descending=[True, False])
+        .select("article", "product", shop1, "shop", "price", "diff")
+        .unique(subset=["article", "shop"], keep="first", maintain_order=True)
+    )
+
+
+@pytest.mark.parametrize("column", ["price", "price_delivery"])
+@pytest.mark.parametrize("max_rank", [2, 4])
+@pytest.mark.parametrize("min_diff", [1.0, 10.0])
+def test_price_gaps_matches_pivot(column, max_rank, min_diff):
+    df = _prices().filter(pl.col("date") == LAST_DAY)
+    df = df.with_columns(rank=pl.col(column).rank("min").over("article"))
+    gaps = price_gaps(df, column, max_rank, min_diff)
+    assert gaps.equals(price_gaps(df.lazy(), column, max_rank, min_diff).collect())
+    key = ["article", "shop"]
+    for shop1 in df["shop"].unique():
+        old = _old_price_gaps(df, shop1, max_rank, min_diff, column)
+        new = gaps.filter(pl.col("leader") == shop1).select(
+            "article", "product", pl.col("leader_price").alias(shop1), "shop", "price", "diff"
+        )
+        assert new.sort(key).equals(old.sort(key).cast(new.schema))
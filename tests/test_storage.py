@@ -0,0 +1,71 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+import data_store
+from conftest import make_prices, wait_for_reloads
+from data_store import load_versioned, read_encrypted
+from ingest import write_segmented
+
+PATH = "./data/Ien.parquet"
+
+
+def _sorted(df):
+    return df.sort("country", "article", "date", "shop")
+
+
+def test_write_segmented_round_trip(workdir):
+    df = make_prices()
+    write_segmented(df, PATH, row_group_rows=1_000)
+    assert _sorted(read_encrypted(PATH)).equals(_sorted(df))
+
+
+def test_read_encrypted_prunes_row_groups(workdir, monkeypatch):
+    df = make_prices()
+    write_segmented(df, PATH, row_group_rows=1_000)
+    decoded = []
+    decode = data_store._decode_parquet
+
+    def counting(buffer, columns=None):
+        part = decode(buffer, columns)
+        decoded.append(part.height)
+        return part
+
+    monkeypatch.setattr(data_store, "_decode_parquet", counting)
+    result = read_encrypted(
+        PATH,
+        columns=["article", "price"],
+        filters=data_store._filters("fr", 10_003, (date(2025, 1, 5), None)),
+    )
+    expected = df.filter(
+        pl.col("country") == "fr",
+        pl.col("article") == 10_003,
+        pl.col("date") >= date(2025, 1, 5),
+    ).select("article", "price")
+    assert result.sort("price").equals(expected.sort("price"))
+    # Sorted by country and article, one article sits in one or two groups
+    assert 0 < len(decoded) <= 2
+
+
+def test_read_encrypted_no_matching_group(workdir):
+    write_segmented(make_prices(), PATH, row_group_rows=1_000)
+    result = read_encrypted(
+        PATH, columns=["article"], filters=data_store._filters("uk")
+    )
+    assert result.height == 0 and result.columns == ["article"]
+
+
+def test_load_versioned_serves_the_old_frame_while_reloading(workdir):
+    df = make_prices(days=12)
+    write_segmented(df.filter(pl.col("date") < date(2025, 1, 12)), PATH)
+    old_version, old = load_versioned(PATH, country="de")
+    write_segmented(df, PATH)
+    assert data_store.dataset_version(PATH) != old_version
+
+    version, frame = load_versioned(PATH, country="de")
+    assert version == old_version and frame.equals(old)
+    wait_for_reloads()
+    version, frame = load_versioned(PATH, country="de")
+    assert version == data_store.dataset_version(PATH)
+    assert _sorted(frame).equals(_sorted(df.filter(pl.col("country") == "de")))
@@ -0,0 +1,17 @@
+import os
+
+from conftest import make_prices
+import ingest
+from warmup import dataset_paths
+
+PATH = "./data/Ien.parquet"
+
+
+def test_dataset_paths_skip_the_history_once_partitioned(workdir):
+    ingest.write_segmented(make_prices(days=5), PATH)
+    assert dataset_paths("./data") == [os.path.join("./data", "Ien.parquet")]
+
+    ingest.partition(PATH, "./data/Ien")
+    paths = dataset_paths("./data")
+    assert os.path.join("./data", "Ien.parquet") not in paths
+    assert paths and all("country=" in path for path in paths)
@@ -0,0 +1,81 @@
+"""Background warm-up of the datasets and lookup tables.
+
+middleware imports this module once per server process and calls
+start_warmup(), so every encrypted file in ./data is decrypted and the
+article pickers and credential index are built while the first user is
+still logging in.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import lookups
+from data_store import PRICES_DIR, PRICES_PATH, load_data
+
+DATA_DIR = "./data"
+WARMUP_WORKERS = 4
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_status = {"started": False, "done": 0, "total": 0, "errors": []}
+
+
+def dataset_paths(root=DATA_DIR):
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Appended segments are loaded together with their base file
+        dirnames[:] = [d for d in dirnames if not d.endswith(".segments")]
+        paths += [os.path.join(dirpath, f) for f in filenames if f.endswith(".parquet")]
+    # Once partitioned, the pages read the history from its partitions only;
+    # loading the single file too would hold it in memory twice
+    partitions = os.path.join(root, os.path.basename(PRICES_DIR))
+    if os.path.isdir(partitions) and any(
+        name.startswith("country=") for name in os.listdir(partitions)
+    ):
+        prices = os.path.normpath(os.path.join(root, os.path.basename(PRICES_PATH)))
+        paths = [path for path in paths if os.path.normpath(path) != prices]
+    return sorted(paths)
+
+
+def _run_task(fn, *args):
+    try:
+        fn(*args)
+    except Exception as e:
+        with _lock:
+            _status["errors"].append(f"{getattr(fn, '__name__', fn)}{args}: {e}")
+    finally:
+        with _lock:
+            _status["done"] += 1
+
+
+def _run(paths, tasks):
+    try:
+        with ThreadPoolExecutor(WARMUP_WORKERS, thread_name_prefix="warmup") as pool:
+            wait([pool.submit(_run_task, load_data, path) for path in paths])
+            # Lookup tables are built from the frames loaded above
+            wait([pool.submit(_run_task, *task) for task in tasks])
+    finally:
+        _ready.set()
+
+
+def start_warmup(root=DATA_DIR, tasks=()):
+    with _lock:
+        if _status["started"]:
+            return
+        _status["started"] = True
+    paths = dataset_paths(root)
+    tasks = lookups.warmup_tasks() + list(tasks)
+    with _lock:
+        _status["total"] = len(paths) + len(tasks)
+    threading.Thread(
+        target=_run, args=(paths, tasks), name="warmup", daemon=True
+    ).start()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def warmup_status():
+    with _lock:
+        return dict(_status, errors=list(_status["errors"]), ready=_ready.is_set())